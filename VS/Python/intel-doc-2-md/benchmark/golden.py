@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import json
+import difflib
+import argparse
+from contextlib import contextmanager
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, '..'))
+import inteldoc2md
+from inteldoc2md.backend import _GENERATED_DATE
+
+# Runs the whole pipeline, Parser, Pile and Writer, on the selection pdf in resources/, checks that every page is
+# identical to the golden page in benchmark/golden/, and measures the throughput. The golden pages are as the
+# writer generates them, with the generated date left out:
+#   python benchmark/golden.py                  check the output, and compare the throughput with the baseline
+#   python benchmark/golden.py --update         store the output as the golden pages
+#   python benchmark/golden.py --save           store the throughput as the baseline
+
+DEFAULT_PDF = os.path.join(BENCHMARK_DIR, '..', 'resources', 'architecture-instruction-set-extensions-programming-reference-selection.pdf')
+DEFAULT_GOLDEN_DIR = os.path.join(BENCHMARK_DIR, 'golden')
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, 'golden_baseline.json')
+
+
+class _MemoryBackend(object):
+	# keeps the generated pages, without the generated date
+
+	def __init__(self):
+		self.pages = {}
+
+	def open(self):
+		pass
+
+	def store(self, name, instruction, source, content, content_hash, generated):
+		self.pages[name] = _GENERATED_DATE.sub('Generated: ', content)
+		return 'created'
+
+	def close(self):
+		pass
+
+
+@contextmanager
+def _quiet():
+	# the pipeline prints a line per page
+	stdout = sys.stdout
+	sys.stdout = open(os.devnull, 'w')
+	try:
+		yield
+	finally:
+		sys.stdout.close()
+		sys.stdout = stdout
+
+
+def run_pipeline(filename):
+	# returns the pages, and the stats of the run
+	stats = inteldoc2md.Stats(trace_memory=False)
+	backend = _MemoryBackend()
+	with _quiet():
+		stats.start()
+		parser = inteldoc2md.Parser(filename, stats)
+		parser.extract()
+		piles = parser.parse()
+		inteldoc2md.Writer(backend, stats=stats).write(piles)
+		stats.stop()
+	return backend.pages, stats
+
+
+def throughput(stats):
+	report = stats.report()
+	return {
+		'seconds': report['wall'],
+		'pages': report['counts']['pages'],
+		'instructions': report['counts']['instructions'],
+		'pages_per_second': report['counts']['pages'] / report['wall'],
+		'instructions_per_second': report['counts']['instructions'] / report['wall'],
+		'peak_rss': report['peak_rss'],
+		'stages': dict((stage, report['stages'][stage]['wall']) for stage in inteldoc2md.stats.STAGES),
+	}
+
+
+def check(pages, golden_dir, max_diff_lines=40):
+	# returns the names of the pages that differ from, are missing from, or are not in the golden pages
+	golden_names = set(filename[:-3] for filename in os.listdir(golden_dir) if filename.endswith('.md'))
+	failures = []
+	for name in sorted(golden_names | set(pages.keys())):
+		if name not in pages:
+			print('missing: ' + name)
+			failures.append(name)
+			continue
+		if name not in golden_names:
+			print('not in the golden pages: ' + name)
+			failures.append(name)
+			continue
+		golden = open(os.path.join(golden_dir, name + '.md'), 'r', encoding='utf8').read()
+		if golden != pages[name]:
+			print('differs: ' + name)
+			diff = list(difflib.unified_diff(golden.splitlines(), pages[name].splitlines(), 'golden/' + name + '.md', name + '.md', lineterm=''))
+			for line in diff[:max_diff_lines]:
+				print('  ' + line)
+			if len(diff) > max_diff_lines:
+				print('  ...')
+			failures.append(name)
+	return failures
+
+
+def update(pages, golden_dir):
+	if not os.path.isdir(golden_dir):
+		os.makedirs(golden_dir)
+	for filename in os.listdir(golden_dir):
+		if filename.endswith('.md') and (filename[:-3] not in pages):
+			os.remove(os.path.join(golden_dir, filename))
+	for name in sorted(pages.keys()):
+		fwrite = open(os.path.join(golden_dir, name + '.md'), 'w', encoding='utf8')
+		fwrite.write(pages[name])
+		fwrite.close()
+	print('writing ' + str(len(pages)) + ' golden pages to ' + golden_dir)
+
+
+def main(argv):
+	argparser = argparse.ArgumentParser(prog='golden.py', description='Run the pipeline on the selection pdf, check the pages against the golden pages and measure the throughput.')
+	argparser.add_argument('--pdf', default=DEFAULT_PDF, help='the pdf to run the pipeline on')
+	argparser.add_argument('--golden', default=DEFAULT_GOLDEN_DIR, help='the directory with the golden pages')
+	argparser.add_argument('--baseline', default=DEFAULT_BASELINE, help='the throughput to compare with or to save to')
+	argparser.add_argument('--repeat', type=int, default=3, help='the fastest of this many runs is taken')
+	argparser.add_argument('--update', action='store_true', help='store the pages as the golden pages')
+	argparser.add_argument('--save', action='store_true', help='store the throughput as the baseline')
+	args = argparser.parse_args(argv[1:])
+
+	best = None
+	for idx in range(args.repeat):
+		pages, stats = run_pipeline(args.pdf)
+		result = throughput(stats)
+		if (best == None) or (result['seconds'] < best['seconds']):
+			best = result
+
+	print('%d pages, %d instructions in %.2fs: %.1f pages/s, %.1f instructions/s, peak rss %s' % (best['pages'], best['instructions'], best['seconds'],
+		best['pages_per_second'], best['instructions_per_second'], ('-' if (best['peak_rss'] == None) else str(best['peak_rss'] // (1024 * 1024)) + ' MiB')))
+	print('  ' + ', '.join(stage + ' %.2fs' % best['stages'][stage] for stage in inteldoc2md.stats.STAGES))
+
+	if args.update:
+		update(pages, args.golden)
+	failures = check(pages, args.golden)
+	print(str(len(pages) - len(failures)) + ' identical, ' + str(len(failures)) + ' different pages')
+
+	if args.save:
+		fwrite = open(args.baseline, 'w')
+		fwrite.write(json.dumps(best, indent=1, sort_keys=True) + '\n')
+		fwrite.close()
+		print('writing ' + args.baseline)
+	elif os.path.isfile(args.baseline):
+		baseline = json.load(open(args.baseline))
+		print('against the baseline: x%.2f pages/s, x%.2f peak rss' % (best['pages_per_second'] / baseline['pages_per_second'],
+			(float(best['peak_rss']) / baseline['peak_rss']) if (best['peak_rss'] and baseline['peak_rss']) else 1.0))
+
+	return 1 if failures else 0
+
+
+if __name__ == '__main__':
+	sys.exit(main(sys.argv))
@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import gc
+import json
+import math
+import time
+import argparse
+from pdfminer.layout import LAParams
+from pdfminer.layout import LTComponent
+from pdfminer.layout import LTPage
+from pdfminer.layout import LTRect
+from pdfminer.layout import LTText
+from pdfminer.layout import LTTextBoxHorizontal
+from pdfminer.layout import LTTextLineHorizontal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from inteldoc2md.pile import Pile
+from inteldoc2md.writer import State
+
+# Times the pile engine on synthetic page layouts, without pdfminer reading a pdf. The layouts are made of the
+# pdfminer classes that Pile.parse_layout recognises; the glyphs are stand-ins that carry the text of a whole
+# line and its font. Every parameter is scaled in turn, with the others at their default, to show how the
+# stages grow; the results are compared with a baseline to catch regressions. The baseline is of the machine that
+# saved it, and is scaled by a calibration run; on a busy machine, use more --repeat:
+#   python benchmark/pile_benchmark.py                  compare with benchmark/baseline.json
+#   python benchmark/pile_benchmark.py --save           store the results as the new baseline
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULTS = {'lines': 40, 'tables': 2, 'rows': 10, 'cols': 4, 'merged': 2}
+SCALES = {'lines': [10, 20, 40, 80, 160], 'tables': [1, 2, 4, 8], 'rows': [5, 10, 20, 40, 80], 'cols': [2, 4, 8, 16], 'merged': [0, 4, 8, 16]}
+STAGES = ['parse_layout', 'split_piles', '_gen_table_intermediate', 'gen_markdown']
+
+_FONT = 'ABCDEF+NeoSansIntel'
+_FONT_MEDIUM = 'ABCDEF+NeoSansIntelMedium'
+_LEFT = 45.0
+_RIGHT = 567.0
+_RULE = 0.5
+_ROW_HEIGHT = 16.0
+_LINE_HEIGHT = 12.0
+
+
+class _Glyph(LTComponent, LTText):
+	# one glyph with the text of a whole line, and the font that Pile looks at in text._objs[0].fontname
+	def __init__(self, bbox, text, fontname):
+		LTComponent.__init__(self, bbox)
+		self.fontname = fontname
+		self._text = text
+
+	def get_text(self):
+		return self._text
+
+
+def _text_line(x0, y0, text, height=9.0, fontname=_FONT):
+	line = LTTextLineHorizontal(0.1)
+	line.add(_Glyph((x0, y0, x0 + (len(text) * height * 0.5), y0 + height), text, fontname))
+	line.analyze(LAParams())
+	return line
+
+
+def _text_box(lines):
+	box = LTTextBoxHorizontal()
+	for line in lines:
+		box.add(line)
+	return box
+
+
+def _rect(x0, y0, x1, y1):
+	return LTRect(_RULE, (x0, y0, x1, y1))
+
+
+def _merged_cells(rows, cols, merged):
+	# the cells (row, col) that span col and col + 1, spread over the body rows
+	cells = set()
+	for k in range(merged):
+		if (rows < 2) or (cols < 2):
+			break
+		cells.add((1 + ((k * 3) % (rows - 1)), (k * 2) % (cols - 1)))
+	return cells
+
+
+def _table(top, rows, cols, merged, objects):
+	# a table drawn as pdfs draw them: a rule per cell side, and no rule between two merged cells
+	width = (_RIGHT - _LEFT) / cols
+	merged_cells = _merged_cells(rows, cols, merged)
+	for row in range(rows):
+		y1 = top - (row * _ROW_HEIGHT)
+		y0 = y1 - _ROW_HEIGHT
+		for col in range(cols + 1):
+			if (row, col - 1) in merged_cells:
+				continue
+			x = _LEFT + (col * width)
+			objects.append(_rect(x, y0, x + _RULE, y1))
+		for col in range(cols):
+			if (row, col - 1) in merged_cells:
+				continue
+			text = ('Opcode' if (col == 0) else 'Column ' + str(col)) if (row == 0) else 'cell ' + str(row) + '.' + str(col)
+			objects.append(_text_box([_text_line(_LEFT + (col * width) + 2.0, y0 + 3.0, text, fontname=(_FONT_MEDIUM if (row == 0) else _FONT))]))
+	for row in range(rows + 1):
+		y = top - (row * _ROW_HEIGHT)
+		objects.append(_rect(_LEFT, y - _RULE, _RIGHT, y))
+	return top - (rows * _ROW_HEIGHT)
+
+
+def make_layout(lines=40, tables=2, rows=10, cols=4, merged=2):
+	# a page with a title, and the text lines in paragraphs between the tables, each paragraph under a heading
+	objects = []
+	y = 40.0 + ((lines + tables + 2) * _LINE_HEIGHT * 1.5) + (tables * (rows + 2) * _ROW_HEIGHT)
+	height = y + 40.0
+	objects.append(_text_box([_text_line(_LEFT, y, 'FAKE — Synthetic Instruction', height=16.0, fontname=_FONT_MEDIUM)]))
+	y -= 2 * _LINE_HEIGHT
+
+	paragraphs = tables + 1
+	for paragraph in range(paragraphs):
+		heading = ['Description', 'Flags Affected', 'Exceptions'][paragraph % 3]
+		paragraph_lines = [_text_line(_LEFT, y, heading, height=10.0, fontname=_FONT_MEDIUM)]
+		y -= 1.5 * _LINE_HEIGHT
+		for idx in range((lines // paragraphs) + (1 if (paragraph < (lines % paragraphs)) else 0)):
+			paragraph_lines.append(_text_line(_LEFT, y, 'Line ' + str(idx) + ' of paragraph ' + str(paragraph) + ' of the synthetic page.'))
+			y -= _LINE_HEIGHT
+		objects.append(_text_box(paragraph_lines))
+		y -= _LINE_HEIGHT
+		if paragraph < tables:
+			y = _table(y, rows, cols, merged, objects) - (2 * _ROW_HEIGHT)
+
+	page = LTPage(1, (0, 0, 612, height))
+	for obj in objects:
+		page.add(obj)
+	return page
+
+
+def _time(function, repeat):
+	# the best of repeat runs, in seconds; as timeit does, without the garbage collector running in between
+	best = None
+	gc.collect()
+	gc.disable()
+	try:
+		for idx in range(repeat):
+			start = time.time()
+			function()
+			elapsed = time.time() - start
+			best = elapsed if (best == None) else min(best, elapsed)
+	finally:
+		gc.enable()
+	return best
+
+
+def _calibrate(repeat):
+	# a fixed amount of plain python work, of the kind the pile engine does (attribute lookups, comparisons,
+	# lists); the results are compared with the baseline relative to it, such that a slower or busier
+	# machine is not taken for a regression
+	class Box(object):
+		def __init__(self, y0):
+			self.y0 = y0
+	boxes = [Box((idx * 7919) % 1000) for idx in range(2000)]
+	def work():
+		for idx in range(10):
+			[box for box in boxes if (box.y0 > 500) or (box.y0 < 100)]
+			sorted(boxes, key=lambda box: box.y0)
+	return _time(work, repeat * 3)
+
+
+def _gen_markdown(piles):
+	state = State()
+	state.prev_pile_is_opcode_table = False
+	state.curr_pile_is_opcode_table = False
+	state.next_pile_is_opcode_table = False
+	for pile in piles:
+		pile.gen_markdown(state)
+
+
+def run_case(params, repeat):
+	layout = make_layout(**params)
+
+	def parse_layout():
+		Pile().parse_layout(layout)
+
+	pile = Pile()
+	pile.parse_layout(layout)
+	piles = pile.split_piles()
+	tables = [p for p in piles if p._is_table()]
+	cells = sum([sum([len(row) for row in table._get_table_intermediate()]) for table in tables])
+	expected = params['tables'] * ((params['rows'] * params['cols']) - len(_merged_cells(params['rows'], params['cols'], params['merged'])))
+	if (len(tables) != params['tables']) or (cells != expected):
+		raise Exception('pile_benchmark: the layout ' + _case_name(params) + ' gives ' + str(len(tables)) + ' tables with ' + str(cells) + ' cells, expected ' + str(expected) + ' cells')
+
+	def gen_table_intermediate():
+		for table in tables:
+			table._gen_table_intermediate()
+
+	return {
+		'parse_layout': _time(parse_layout, repeat),
+		'split_piles': _time(pile.split_piles, repeat),
+		'_gen_table_intermediate': _time(gen_table_intermediate, repeat),
+		'gen_markdown': _time(lambda: _gen_markdown(piles), repeat),
+	}
+
+
+def _case_name(params):
+	return ','.join(key + '=' + str(params[key]) for key in ['lines', 'tables', 'rows', 'cols', 'merged'])
+
+
+def run(parameters, repeat):
+	results = {}
+	for parameter in parameters:
+		print(parameter + ':')
+		print('  %-8s' % parameter + ''.join(['%26s' % stage for stage in STAGES]))
+		previous = None
+		for value in SCALES[parameter]:
+			params = dict(DEFAULTS)
+			params[parameter] = value
+			result = run_case(params, repeat)
+			results[_case_name(params)] = result
+
+			# the growth per step as an exponent: 1.0 is linear in the parameter, 2.0 quadratic
+			columns = []
+			for stage in STAGES:
+				exponent = ''
+				if (previous != None) and (previous[1][stage] > 0) and (result[stage] > 0) and (previous[0] > 0):
+					exponent = ' (^%.1f)' % (math.log(result[stage] / previous[1][stage]) / math.log(float(value) / previous[0]))
+				columns.append('%26s' % (('%.2f ms' % (result[stage] * 1000)) + exponent))
+			print('  %-8s' % value + ''.join(columns))
+			previous = (value, result)
+	return results
+
+
+def compare(results, baseline, threshold):
+	# returns the regressions: the cases and stages that are more than threshold slower than the baseline,
+	# with the baseline scaled by how much faster or slower the calibration ran
+	regressions = []
+	scale = results['calibration'] / baseline['calibration']
+	for case in sorted(results.keys()):
+		if (case == 'calibration') or (case not in baseline):
+			continue
+		for stage in STAGES:
+			base = baseline[case].get(stage)
+			if (base == None) or (base <= 0):
+				continue
+			base = base * scale
+			ratio = results[case][stage] / base
+			if ratio > (1.0 + threshold):
+				regressions.append((case, stage, base, results[case][stage], ratio))
+	return regressions
+
+
+def main(argv):
+	argparser = argparse.ArgumentParser(prog='pile_benchmark.py', description='Time parse_layout, split_piles, _gen_table_intermediate and gen_markdown of Pile on synthetic page layouts.')
+	argparser.add_argument('--parameter', choices=sorted(SCALES.keys()), action='append', help='scale only this parameter; may be given more than once')
+	argparser.add_argument('--repeat', type=int, default=7, help='the best of this many runs is taken')
+	argparser.add_argument('--baseline', default=DEFAULT_BASELINE, help='the baseline to compare with or to save to')
+	argparser.add_argument('--save', action='store_true', help='store the results as the baseline')
+	argparser.add_argument('--threshold', type=float, default=0.5, help='report a regression when a stage is this fraction slower than the baseline')
+	args = argparser.parse_args(argv[1:])
+
+	calibration = _calibrate(args.repeat)
+	results = run(args.parameter or sorted(SCALES.keys()), args.repeat)
+	# calibrated before and after, the faster of the two
+	results['calibration'] = min(calibration, _calibrate(args.repeat))
+	print('calibration: %.2f ms' % (results['calibration'] * 1000))
+
+	if args.save:
+		baseline = {}
+		if os.path.isfile(args.baseline):
+			baseline = json.load(open(args.baseline))
+		baseline.update(results)
+		fwrite = open(args.baseline, 'w')
+		fwrite.write(json.dumps(baseline, indent=1, sort_keys=True) + '\n')
+		fwrite.close()
+		print('writing ' + args.baseline)
+		return 0
+
+	if not os.path.isfile(args.baseline):
+		print('no baseline ' + args.baseline + ', run with --save to store one')
+		return 0
+	regressions = compare(results, json.load(open(args.baseline)), args.threshold)
+	for case, stage, base, result, ratio in regressions:
+		print('regression: %s %s %.2f ms (calibrated baseline) -> %.2f ms (x%.2f)' % (case, stage, base * 1000, result * 1000, ratio))
+	print(str(len(regressions)) + ' regressions against ' + args.baseline)
+	return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+	sys.exit(main(sys.argv))
@@ -1,2 +1,11 @@
 from inteldoc2md.parser import Parser
 from inteldoc2md.writer import Writer
+from inteldoc2md.backend import DirectoryBackend, SqliteBackend, ZipBackend
+from inteldoc2md.signature import SignatureWriter
+from inteldoc2md.document import DocumentWriter
+from inteldoc2md.index import MnemonicIndex
+from inteldoc2md.corpus import Corpus
+from inteldoc2md.server import serve
+from inteldoc2md.stats import Stats
+from inteldoc2md.watch import Watcher
+from inteldoc2md.profiler import StackProfiler, CProfiler, create_profiler, profile_pages
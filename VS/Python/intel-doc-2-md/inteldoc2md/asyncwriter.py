@@ -0,0 +1,76 @@
+import os
+import queue
+import threading
+
+
+class AsyncWriter(object):
+	# Writes files on a pool of background threads, such that disk I/O overlaps with generating
+	# the markdown. The queues are bounded: when the disk cannot keep up, write() blocks.
+	# Every filename goes to the same thread, so a file written twice ends with the last content.
+
+	def __init__(self, num_threads=4, max_pending=64):
+		self._queues = [queue.Queue(max(1, max_pending // num_threads)) for i in range(num_threads)]
+		self._errors = []
+		self._threads = []
+		for worker_queue in self._queues:
+			thread = threading.Thread(target=self._run, args=(worker_queue,))
+			thread.daemon = True
+			thread.start()
+			self._threads.append(thread)
+
+
+	def write(self, filename, content):
+		if not self._threads:
+			raise Exception('AsyncWriter is closed')
+		self._queues[hash(filename) % len(self._queues)].put((filename, content))
+
+
+	def flush(self):
+		# barrier: returns when every queued file is on disk
+		for worker_queue in self._queues:
+			worker_queue.join()
+		if self._errors:
+			errors = self._errors
+			self._errors = []
+			raise errors[0]
+
+
+	def close(self):
+		for worker_queue in self._queues:
+			worker_queue.put(None)
+		for thread in self._threads:
+			thread.join()
+		self._threads = []
+		self.flush()
+
+
+	def _run(self, worker_queue):
+		while True:
+			item = worker_queue.get()
+			try:
+				if item == None:
+					return
+				filename, content = item
+				AsyncWriter._write_atomic(filename, content)
+			except Exception as e:
+				self._errors.append(e)
+			finally:
+				worker_queue.task_done()
+
+
+	@staticmethod
+	def _write_atomic(filename, content):
+		# write to a temp file next to the target and rename it, a reader never sees a half written file.
+		# '\n' is not translated to '\r\n' on Windows: the mnemonic index stores offsets into the file
+		tmp_filename = filename + '.' + str(threading.current_thread().ident) + '.tmp'
+		try:
+			fwrite = open(tmp_filename, 'w', encoding='utf8', newline='\n')
+			try:
+				fwrite.write(content)
+			finally:
+				fwrite.close()
+			os.replace(tmp_filename, filename)
+		except:
+			if os.path.exists(tmp_filename):
+				os.remove(tmp_filename)
+			raise
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import json
+import time
+import sqlite3
+import zipfile
+import hashlib
+from inteldoc2md.asyncwriter import AsyncWriter
+
+
+_GENERATED_DATE = re.compile('Generated: [0-9]+-[0-9]+-[0-9]+')
+
+def content_hash(content):
+	# the generated date changes every day, leave it out of the hash
+	content = _GENERATED_DATE.sub('Generated: ', content)
+	return hashlib.sha1(content.encode('utf8')).hexdigest()
+
+
+# An output backend receives every generated page through store(name, instruction, source, content, content_hash, generated)
+# between open() and close(). store() returns 'created', 'updated' or 'unchanged'.
+
+class DirectoryBackend(object):
+	# one md file per instruction, the layout copy.cmd pushes into the wiki
+
+	def __init__(self, output_dir='./output', num_threads=4):
+		self.output_dir = output_dir
+		self._manifest_filename = os.path.join(output_dir, 'manifest.json')
+		self._manifest = {}
+		self._num_threads = num_threads
+		self._file_writer = None
+		self._pending = []
+
+
+	def open(self):
+		self._manifest = {}
+		if os.path.isfile(self._manifest_filename):
+			fread = open(self._manifest_filename, 'r')
+			self._manifest = json.load(fread)
+			fread.close()
+		self._file_writer = AsyncWriter(self._num_threads)
+		self._pending = []
+
+
+	def store(self, name, instruction, source, content, content_hash, generated):
+		filename = os.path.join(self.output_dir, name + '.md')
+		existing_hash = self._existing_hash(filename)
+
+		if existing_hash == content_hash:
+			if filename not in self._pending:
+				self._manifest[os.path.basename(filename)] = {'hash': content_hash, 'mtime': os.path.getmtime(filename)}
+			return 'unchanged'
+
+		print('writing ' + filename)
+		self._file_writer.write(filename, content)
+		self._pending.append(filename)
+		self._manifest[os.path.basename(filename)] = {'hash': content_hash, 'mtime': None}
+		return 'created' if (existing_hash == None) else 'updated'
+
+
+	def close(self):
+		# wait until all files are on disk before recording their mtimes
+		self._file_writer.close()
+		self._file_writer = None
+		for filename in self._pending:
+			self._manifest[os.path.basename(filename)]['mtime'] = os.path.getmtime(filename)
+		self._pending = []
+
+		fwrite = open(self._manifest_filename, 'w')
+		json.dump(self._manifest, fwrite, indent=1, sort_keys=True)
+		fwrite.close()
+
+
+	def _existing_hash(self, filename):
+		entry = self._manifest.get(os.path.basename(filename))
+		if (entry != None) and (entry['mtime'] == None):
+			# written earlier in this run, the file may still be in the queue
+			return entry['hash']
+		if not os.path.isfile(filename):
+			return None
+		if (entry != None) and (entry['mtime'] == os.path.getmtime(filename)):
+			return entry['hash']
+		# no entry, or the file was touched outside of the writer
+		fread = open(filename, 'r', encoding='utf8')
+		content = fread.read()
+		fread.close()
+		return content_hash(content)
+
+
+class SqliteBackend(object):
+	# all pages in a single SQLite database, one row per page
+
+	def __init__(self, filename='./output/inteldoc2md.sqlite'):
+		self.filename = filename
+		self._connection = None
+
+
+	def open(self):
+		self._connection = sqlite3.connect(self.filename)
+		self._connection.execute('CREATE TABLE IF NOT EXISTS pages (name TEXT PRIMARY KEY, mnemonic TEXT NOT NULL, source TEXT, markdown TEXT NOT NULL, hash TEXT NOT NULL, generated TEXT)')
+		self._connection.execute('CREATE INDEX IF NOT EXISTS pages_mnemonic ON pages (mnemonic)')
+
+
+	def store(self, name, instruction, source, content, content_hash, generated):
+		row = self._connection.execute('SELECT hash FROM pages WHERE name = ?', (name,)).fetchone()
+		if (row != None) and (row[0] == content_hash):
+			return 'unchanged'
+
+		self._connection.execute('INSERT OR REPLACE INTO pages (name, mnemonic, source, markdown, hash, generated) VALUES (?, ?, ?, ?, ?, ?)',
+			(name, instruction, source, content, content_hash, generated))
+		return 'created' if (row == None) else 'updated'
+
+
+	def close(self):
+		self._connection.commit()
+		self._connection.close()
+		self._connection = None
+
+
+class ZipBackend(object):
+	# all md files in a single zip archive, with the manifest stored next to them in the archive
+
+	_MANIFEST = 'manifest.json'
+
+	def __init__(self, filename='./output/inteldoc2md.zip'):
+		self.filename = filename
+		self._old = None
+		self._old_manifest = {}
+		self._entries = {}
+		self._names = []
+		self._changed = False
+
+
+	def open(self):
+		self._old = None
+		self._old_manifest = {}
+		self._entries = {}
+		self._names = []
+		self._changed = False
+		if os.path.isfile(self.filename):
+			self._old = zipfile.ZipFile(self.filename, 'r')
+			if ZipBackend._MANIFEST in self._old.namelist():
+				self._old_manifest = json.loads(self._old.read(ZipBackend._MANIFEST))
+
+
+	def store(self, name, instruction, source, content, content_hash, generated):
+		entry_name = name + '.md'
+		if entry_name in self._entries:
+			existing_hash = self._entries[entry_name][1]
+		else:
+			existing_hash = self._old_manifest.get(entry_name)
+
+		if existing_hash == content_hash:
+			if entry_name not in self._entries:
+				# keep the old entry, including its generated date
+				self._entries[entry_name] = (None, content_hash)
+				self._names.append(entry_name)
+			return 'unchanged'
+
+		if entry_name not in self._entries:
+			self._names.append(entry_name)
+		self._entries[entry_name] = (content, content_hash)
+		self._changed = True
+		return 'created' if (existing_hash == None) else 'updated'
+
+
+	def close(self):
+		if (self._old != None) and (not self._changed) and (sorted(self._names) == sorted(self._old_manifest.keys())):
+			self._old.close()
+			self._old = None
+			return
+
+		# the archive is rebuilt next to the old one and renamed over it
+		tmp_filename = self.filename + '.tmp'
+		archive = zipfile.ZipFile(tmp_filename, 'w', zipfile.ZIP_DEFLATED)
+		manifest = {}
+		for entry_name in self._names:
+			content, entry_hash = self._entries[entry_name]
+			if content == None:
+				archive.writestr(self._old.getinfo(entry_name), self._old.read(entry_name))
+			else:
+				info = zipfile.ZipInfo(entry_name, time.localtime()[:6])
+				info.compress_type = zipfile.ZIP_DEFLATED
+				archive.writestr(info, content)
+			manifest[entry_name] = entry_hash
+		archive.writestr(ZipBackend._MANIFEST, json.dumps(manifest, indent=1, sort_keys=True))
+		archive.close()
+
+		if self._old != None:
+			self._old.close()
+			self._old = None
+		os.replace(tmp_filename, self.filename)
+		print('writing ' + self.filename)
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import hashlib
+from inteldoc2md.document import DocumentWriter, SECTION_TYPES
+from inteldoc2md.index import MnemonicIndex
+from inteldoc2md.signature import SignatureWriter
+
+
+class Corpus(object):
+	# All instruction pages in memory: the markdown and the structured document of every page, with dictionaries
+	# from mnemonic and section onto the pages. The Writer fills it, as its backend and as its document sink.
+
+	def __init__(self):
+		self.pages = {}
+		self._names = {}
+		self._opcode_rows = {}
+		self._sections = {}
+
+
+	def open(self):
+		pass
+
+
+	def store(self, name, instruction, source, content, content_hash, generated):
+		status = 'updated' if (name in self.pages) else 'created'
+		self.pages.setdefault(name, {})['markdown'] = content
+		return status
+
+
+	def add_page(self, name, instruction, source, blocks):
+		document = DocumentWriter.build(name, instruction, source, blocks)
+		if 'document' in self.pages.get(name, {}):
+			# a page that is written again replaces its entries
+			self._remove_from_index(name)
+		self.pages.setdefault(name, {})['document'] = document
+		self._add_to_index(name, document)
+
+
+	def close(self):
+		pass
+
+
+	def instructions(self):
+		return sorted(self.pages.keys())
+
+
+	def markdown(self, mnemonic):
+		names = self._names.get(MnemonicIndex._key(mnemonic), [])
+		return self.pages[names[0]]['markdown'] if names else None
+
+
+	def opcodes(self, mnemonic):
+		# the rows of the opcode tables that are about mnemonic, per page, with the header of the table
+		results = []
+		for name, row in self._opcode_rows.get(MnemonicIndex._key(mnemonic), []):
+			if (not results) or (results[-1]['name'] != name):
+				results.append({'name': name, 'header': self.pages[name]['document']['opcodes'][0], 'rows': []})
+			results[-1]['rows'].append(row)
+		return results
+
+
+	def section(self, section):
+		# the pages with a section with this heading ('Flags Affected') or of this type ('flags')
+		return sorted(set(self._sections.get(section.strip().lower(), [])))
+
+
+	def save(self, filename, pdf_filename):
+		fwrite = open(filename + '.tmp', 'w', encoding='utf8')
+		fwrite.write(json.dumps(Corpus._cache_key(pdf_filename)) + '\n')
+		for name in sorted(self.pages.keys()):
+			fwrite.write(json.dumps({'name': name, 'markdown': self.pages[name]['markdown'], 'document': self.pages[name]['document']}, sort_keys=True) + '\n')
+		fwrite.close()
+		os.replace(filename + '.tmp', filename)
+		print('writing ' + filename)
+
+
+	def load(self, filename, pdf_filename):
+		# returns False when there is no cache, or when it was made from another version of the pdf
+		if not os.path.isfile(filename):
+			return False
+		fread = open(filename, 'r', encoding='utf8')
+		try:
+			if json.loads(fread.readline()) != Corpus._cache_key(pdf_filename):
+				return False
+			for line in fread:
+				page = json.loads(line)
+				self.pages[page['name']] = {'markdown': page['markdown'], 'document': page['document']}
+				self._add_to_index(page['name'], page['document'])
+		finally:
+			fread.close()
+		print('loaded ' + str(len(self.pages)) + ' pages from ' + filename)
+		return True
+
+
+	@staticmethod
+	def _cache_key(pdf_filename):
+		# with the version of the code, such that a change to the parser, the piles or the writer makes the pages again
+		return {'pdf': os.path.abspath(pdf_filename), 'mtime': os.path.getmtime(pdf_filename), 'size': os.path.getsize(pdf_filename), 'code': Corpus._code_version()}
+
+
+	@staticmethod
+	def _code_version():
+		# the sha1 of the inteldoc2md sources
+		directory = os.path.dirname(os.path.abspath(__file__))
+		sha1 = hashlib.sha1()
+		for filename in sorted(os.listdir(directory)):
+			if filename.endswith('.py'):
+				fread = open(os.path.join(directory, filename), 'rb')
+				sha1.update(filename.encode('utf8') + b'\0' + fread.read())
+				fread.close()
+		return sha1.hexdigest()
+
+
+	def _add_to_index(self, name, document):
+		# the pages before the first instruction title have no instruction, and are named 'None' like their file
+		instruction = str(document['instruction'])
+		for mnemonic in instruction.replace('/', ' ').split():
+			if name not in self._names.setdefault(MnemonicIndex._key(mnemonic), []):
+				self._names[MnemonicIndex._key(mnemonic)].append(name)
+
+		rows = document['opcodes']
+		if rows:
+			header = [cell['text'] for cell in rows[0]]
+			for row in rows[1:]:
+				for cell, mnemonic, form in SignatureWriter.instruction_forms([header, [cell['text'] for cell in row]], instruction):
+					for key in set([MnemonicIndex._key(mnemonic), MnemonicIndex._key(form)]):
+						self._opcode_rows.setdefault(key, []).append((name, row))
+						if name not in self._names.setdefault(key, []):
+							self._names[key].append(name)
+
+		for section_type in SECTION_TYPES:
+			for section in document[section_type]:
+				self._sections.setdefault(section_type, []).append(name)
+				self._sections.setdefault(section['heading'].strip().lower(), []).append(name)
+
+
+	def _remove_from_index(self, name):
+		for index in [self._names, self._sections]:
+			for key in list(index.keys()):
+				index[key] = [other for other in index[key] if other != name]
+				if not index[key]:
+					del index[key]
+		for key in list(self._opcode_rows.keys()):
+			self._opcode_rows[key] = [(other, row) for other, row in self._opcode_rows[key] if other != name]
+			if not self._opcode_rows[key]:
+				del self._opcode_rows[key]
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import json
+from inteldoc2md.pile import Pile
+from inteldoc2md.signature import SignatureWriter
+try:
+	import msgpack
+except ImportError:
+	msgpack = None
+
+
+_HEADER = re.compile('\n### (.*)\n')
+SECTION_TYPES = ['description', 'encoding', 'operation', 'flags', 'intrinsics', 'exceptions', 'other']
+
+
+class DocumentWriter(object):
+	# Writes one structured document per instruction page, as JSON Lines and/or as a stream of MessagePack maps:
+	#   name, instruction, summary, source: strings
+	#   opcodes: the opcode table, a list of rows, a row is a list of cells {text, colspan, rowspan}
+	#   description, encoding, operation, flags, intrinsics, exceptions, other: lists of sections {heading, markdown, tables}
+
+	def __init__(self, jsonl_filename=None, msgpack_filename=None):
+		if (msgpack_filename != None) and (msgpack == None):
+			raise Exception('DocumentWriter: writing MessagePack needs the msgpack package (pip install msgpack)')
+		self.jsonl_filename = jsonl_filename
+		self.msgpack_filename = msgpack_filename
+		self._jsonl_file = None
+		self._msgpack_file = None
+
+
+	def open(self):
+		if self.jsonl_filename != None:
+			self._jsonl_file = open(self.jsonl_filename + '.tmp', 'w', encoding='utf8')
+		if self.msgpack_filename != None:
+			self._msgpack_file = open(self.msgpack_filename + '.tmp', 'wb')
+
+
+	def add_page(self, name, instruction, source, blocks):
+		document = DocumentWriter.build(name, instruction, source, blocks)
+		if self._jsonl_file != None:
+			self._jsonl_file.write(json.dumps(document, sort_keys=True) + '\n')
+		if self._msgpack_file != None:
+			self._msgpack_file.write(msgpack.packb(document))
+
+
+	def close(self):
+		for fwrite, filename in [(self._jsonl_file, self.jsonl_filename), (self._msgpack_file, self.msgpack_filename)]:
+			if fwrite == None:
+				continue
+			fwrite.close()
+			os.replace(filename + '.tmp', filename)
+			print('writing ' + filename)
+		self._jsonl_file = None
+		self._msgpack_file = None
+
+
+	@staticmethod
+	def build(name, instruction, source, blocks):
+		# blocks: what the writer generated for this page, in order: ('text', markdown, False) for paragraphs and
+		# ('table', rows, continued) for tables, where continued tables carry on the previous table on the next page
+		document = {'name': name, 'instruction': instruction, 'source': source, 'summary': '', 'opcodes': []}
+		for section_type in SECTION_TYPES:
+			document[section_type] = []
+
+		title = {'heading': None, 'markdown': '', 'tables': []}
+		section = title
+		for kind, payload, continued in blocks:
+			if kind == 'table':
+				if continued and section['tables']:
+					section['tables'][-1] = section['tables'][-1] + payload[1:]
+				else:
+					section['tables'].append(payload)
+				continue
+
+			parts = _HEADER.split(payload)
+			section['markdown'] += parts[0]
+			for idx in range(1, len(parts), 2):
+				section = {'heading': parts[idx], 'markdown': parts[idx + 1], 'tables': []}
+				document[Pile.SECTIONS.get(parts[idx], 'other')].append(section)
+
+		for section_type in SECTION_TYPES:
+			for section in document[section_type]:
+				section['markdown'] = section['markdown'].strip()
+
+		document['summary'] = SignatureWriter.description(title['markdown'])
+		if title['tables']:
+			document['opcodes'] = title['tables'][0]
+		return document
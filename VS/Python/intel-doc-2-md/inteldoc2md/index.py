@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import re
+import sqlite3
+from inteldoc2md.signature import SignatureWriter
+
+
+class MnemonicIndex(object):
+	# Maps every individual mnemonic, alias and instruction form onto the page that documents it, and the byte
+	# offset of its row in that page. Multi-mnemonic pages such as REP_REPE_REPZ_REPNE_REPNZ are found by each
+	# of their mnemonics. The index is an SQLite table with an index on the key, such that a lookup is O(log n).
+
+	def __init__(self, filename='./output/index.sqlite'):
+		self.filename = filename
+		self._connection = None
+
+
+	def open(self):
+		self._connection = sqlite3.connect(self.filename)
+		self._connection.execute('CREATE TABLE IF NOT EXISTS mnemonic_index (key TEXT NOT NULL, kind TEXT NOT NULL, name TEXT NOT NULL, offset INTEGER NOT NULL)')
+		self._connection.execute('CREATE INDEX IF NOT EXISTS mnemonic_index_key ON mnemonic_index (key)')
+		# rebuilt from scratch every run, it is cheap and nothing goes stale
+		self._connection.execute('DELETE FROM mnemonic_index')
+
+
+	def add_page(self, name, instruction, content, rows):
+		# content: the page as generated, with '\n' line endings; rows: the cells of its opcode table, the first row is the header.
+		# The offsets are in bytes of the page as every backend stores it: utf-8, with the same '\n' line endings
+		entries = []
+		for mnemonic in str(instruction).replace('/', ' ').split():
+			entries.append((mnemonic, 'title', 0))
+
+		if rows:
+			offset = 0
+			for cell, mnemonic, form in SignatureWriter.instruction_forms(rows, instruction):
+				pos = content.find(cell, offset)
+				if pos != -1:
+					offset = pos
+				byte_offset = len(content[:offset].encode('utf8'))
+				entries.append((mnemonic, 'mnemonic', byte_offset))
+				entries.append((form, 'form', byte_offset))
+
+		rows = set()
+		for key, kind, offset in entries:
+			rows.add((MnemonicIndex._key(key), kind, name, offset))
+		self._connection.executemany('INSERT INTO mnemonic_index (key, kind, name, offset) VALUES (?, ?, ?, ?)', sorted(rows))
+
+
+	def close(self):
+		self._connection.commit()
+		self._connection.close()
+		self._connection = None
+		print('writing ' + self.filename)
+
+
+	def lookup(self, key):
+		# returns (kind, name, offset) for every page that documents key, the title entries first
+		connection = self._connection if (self._connection != None) else sqlite3.connect(self.filename)
+		try:
+			cursor = connection.execute('SELECT kind, name, offset FROM mnemonic_index WHERE key = ? ORDER BY kind DESC, name, offset', (MnemonicIndex._key(key),))
+			return cursor.fetchall()
+		finally:
+			if connection != self._connection:
+				connection.close()
+
+
+	@staticmethod
+	def _key(str):
+		# 'tdpbssd tmm1, tmm2, tmm3' and 'TDPBSSD TMM1,TMM2,TMM3' are the same key
+		str = re.sub(' *, *', ',', str.strip().upper())
+		return re.sub(' +', ' ', str)
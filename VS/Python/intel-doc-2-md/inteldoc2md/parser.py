@@ -1,5 +1,6 @@
 
 
+import hashlib
 from pdfminer.pdfparser import PDFParser
 from pdfminer.pdfdocument import PDFDocument
 from pdfminer.pdfpage import PDFPage
@@ -8,14 +9,19 @@ from pdfminer.pdfinterp import PDFPageInterpreter
 from pdfminer.pdfdevice import PDFDevice
 from pdfminer.layout import LAParams
 from pdfminer.converter import PDFPageAggregator
-from pile import Pile
+from pdfminer.pdftypes import resolve1
+from inteldoc2md.pile import Pile
+from inteldoc2md.stats import measure
 
 
 class Parser(object):
-	def __init__(self, filename):
+	def __init__(self, filename, stats=None):
+		self.stats = stats
 		self._document = self._read_file(filename)
 		self._device, self._interpreter = self._prepare_tools()
 		self._pages = {}
+		self._page_numbers = {}
+		self._digests = {}
 
 
 	def extract(self, page_num_start=None, page_num_end=None):
@@ -32,23 +38,52 @@ class Parser(object):
 				return
 
 			if (page_counter >= page_num_start): 
-				self._interpreter.process_page(page)
-				layout = self._device.get_result()
+				layout = self._extract_page(page, page_counter)
 				print('page no.' + str(page_counter) + '; extracted page no.' + str(layout.pageid))
 				self._pages[counter] = layout
+				self._page_numbers[counter] = page_counter
 				counter = counter + 1
 
 			page_counter = page_counter + 1
 
 
+	def extract_changed(self, previous=None):
+		# extract only the pages whose content is not among the pages that previous, a parser of an earlier version of
+		# the pdf, extracted; the layouts of the other pages are taken over. Returns the numbers of the extracted pages
+		layouts = {}
+		if previous != None:
+			for page_num, digest in previous._digests.items():
+				layouts[digest] = previous._pages[page_num]
+
+		changed = []
+		counter = 0
+		for page in PDFPage.create_pages(self._document):
+			digest = Parser._page_digest(page)
+			if digest in layouts:
+				self._pages[counter] = layouts[digest]
+			else:
+				layout = self._extract_page(page, counter + 1)
+				print('page no.' + str(counter + 1) + '; extracted page no.' + str(layout.pageid))
+				self._pages[counter] = layout
+				changed.append(counter)
+			self._page_numbers[counter] = counter + 1
+			self._digests[counter] = digest
+			counter = counter + 1
+		return changed
+
+
+	def page_digests(self):
+		return [self._digests[page_num] for page_num in sorted(self._digests.keys())]
+
+
 	def parse(self, page_num=None):
 		piles = []
 		if page_num == None:
 			for page_num, page in self._pages.items():				
-				piles += self._parse_page(page)
+				piles += self._parse_page(page, self._page_numbers[page_num])
 		else:
 			page = self._pages[page_num]
-			piles = self._parse_page(page)
+			piles = self._parse_page(page, self._page_numbers[page_num])
 		return piles
 
 
@@ -60,6 +95,24 @@ class Parser(object):
 		return document
 
 
+	@staticmethod
+	def _page_digest(page):
+		# the content streams and the geometry of the page; a font or image that changed under the same name is not seen
+		digest = hashlib.sha1((repr(page.mediabox) + ' ' + str(page.rotate)).encode('utf8'))
+		for stream in page.contents:
+			digest.update(resolve1(stream).get_data())
+		return digest.hexdigest()
+
+
+	def _extract_page(self, page, page_number):
+		with measure(self.stats, 'layout', page_number):
+			self._interpreter.process_page(page)
+			layout = self._device.get_result()
+		if self.stats != None:
+			self.stats.count('pages')
+		return layout
+
+
 	def _prepare_tools(self):
 		laparams = LAParams()
 		rsrcmgr = PDFResourceManager()
@@ -68,10 +121,13 @@ class Parser(object):
 		return device, interpreter
 
 
-	def _parse_page(self, page):
+	def _parse_page(self, page, page_number):
 		print('parsing page '+str(page.pageid))
-		pile = Pile()
-		pile.parse_layout(page)
-		piles = pile.split_piles()
+		with measure(self.stats, 'split', page_number):
+			pile = Pile()
+			pile.parse_layout(page)
+			piles = pile.split_piles()
+		for pile in piles:
+			pile.page = page_number
 		return piles
 
@@ -1,3 +1,4 @@
+# -*- coding: utf-8 -*-
 
 from pdfminer.layout import LTFigure
 from pdfminer.layout import LTTextBox
@@ -12,21 +13,52 @@ from pdfminer.layout import LTChar
 from pdfminer.layout import LTLine
 from pdfminer.layout import LTAnno
 import binascii
+import bisect
 import re
 from operator import itemgetter, attrgetter
 
 
-class MyPile(object):
+class Pile(object):
+	# section headings in the instruction pages, and the type of the section they start
+	SECTIONS = {
+		'Description': 'description',
+		'IA-32 Architecture Compatibility': 'description',
+		'Instruction Operand Encoding': 'encoding',
+		'Operation': 'operation',
+		'Flags Affected': 'flags',
+		'FPU Flags Affected': 'flags',
+		'Intel C/C++ Compiler Intrinsic Equivalent': 'intrinsics',
+		'C/C++ Compiler Intrinsic Equivalent': 'intrinsics',
+		'Other Exceptions': 'exceptions',
+		'Compatibility Mode Exceptions': 'exceptions',
+		'64-Bit Mode Exceptions': 'exceptions',
+		'Exceptions (All Operating Modes)': 'exceptions',
+		'Floating-Point Exceptions': 'exceptions',
+		'Other Mode Exceptions': 'exceptions',
+		'Virtual-8086 Mode Exceptions': 'exceptions',
+		'SIMD Floating-Point Exceptions': 'exceptions',
+		'SIMD Floating Point Exceptions': 'exceptions',
+		'Protected Mode Exceptions': 'exceptions',
+		'Exceptions': 'exceptions',
+		'Numeric Exceptions': 'exceptions',
+		'Virtual 8086 Mode Exceptions': 'exceptions',
+		'Real-Address Mode Exceptions': 'exceptions',
+	}
+
 	def __init__(self):
 		self.verticals = []
 		self.horizontals = []
 		self.texts = []
 		self.images = []
+		self.page = None # the number of the pdf page, set by the parser
+		self.ranks = None # the rank of every text of the page in reading order, shared by the piles of the page
+		self._intermediate = None
+		self._ranked = None
 
 		self._SEARCH_DISTANCE_VERTICAL = 1.0
 		self._SEARCH_DISTANCE_HORIZONTAL = 8.0
 
-	def __nonzero__(self):
+	def __bool__(self):
 		return bool(self.texts)
 
 
@@ -46,10 +78,10 @@ class MyPile(object):
 			#print 'Pile:parse_layout: type: ' + str(type(obj))
 
 			if type(obj) in [LTFigure, LTTextBox, LTTextLine, LTTextBoxHorizontal]:
-				#print 'Pile:parse_layout: type='+str(type(obj))+'; content = '+ obj.get_text().encode('utf8').strip()
+				#print 'Pile:parse_layout: type='+str(type(obj))+'; content = '+ obj.get_text().strip()
 				obj_stack.extend(reversed(list(obj)))
 			elif type(obj) == LTTextLineHorizontal:
-				#print 'Pile:parse_layout: type='+str(type(obj))+'; content = '+ obj.get_text().encode('utf8').strip()
+				#print 'Pile:parse_layout: type='+str(type(obj))+'; content = '+ obj.get_text().strip()
 				self.texts.append(obj)
 			elif type(obj) == LTRect:
 				if obj.width < 1.0:
@@ -59,16 +91,16 @@ class MyPile(object):
 					self._adjust_to_close(obj, self.horizontals, 'y0', self._SEARCH_DISTANCE_HORIZONTAL)
 					self.horizontals.append(obj)
 			elif type(obj) == LTImage:
-				print('Pile:parse_layout: type='+str(type(obj))+'; content = '+ obj.get_text().encode('utf8').strip())
+				print('Pile:parse_layout: type='+str(type(obj))+'; content = '+ obj.get_text().strip())
 				self.images.append(obj)
 			elif type(obj) == LTCurve:
-				#print 'Pile:parse_layout: type='+str(type(obj))+'; content = '+ obj.get_text().encode('utf8').strip()
+				#print 'Pile:parse_layout: type='+str(type(obj))+'; content = '+ obj.get_text().strip()
 				pass
 			elif type(obj) == LTChar:
-				#print 'Pile:parse_layout: type='+str(type(obj))+'; content = '+ obj.get_text().encode('utf8').strip()
+				#print 'Pile:parse_layout: type='+str(type(obj))+'; content = '+ obj.get_text().strip()
 				pass
 			elif type(obj) == LTLine:
-				#print 'Pile:parse_layout: type='+str(type(obj))+'; content = '+ obj.get_text().encode('utf8').strip()
+				#print 'Pile:parse_layout: type='+str(type(obj))+'; content = '+ obj.get_text().strip()
 				pass
 			else:
 				print('Pile:parse_layout: Unrecognized type: ' + str(type(obj)))
@@ -88,6 +120,11 @@ class MyPile(object):
 		images = self._find_images()
 
 		piles = sorted(tables + paragraphs + images, reverse=True, key=Pile.get_key)
+
+		# the texts of the page are sorted once; the piles order their texts by these ranks
+		ranks = self._rank_texts()
+		for pile in piles:
+			pile.ranks = ranks
 		return piles
 
 
@@ -165,7 +202,7 @@ class MyPile(object):
 		num_slots = len(tables) + 1
 		paragraphs = [Pile() for idx in range(num_slots)]
 		for text in self.texts:
-			content = text.get_text().encode('utf8').strip()
+			content = text.get_text().strip()
 			if text in all_table_texts:
 				continue
 			for idx, top in enumerate(tops):
@@ -173,7 +210,7 @@ class MyPile(object):
 					paragraphs[idx].texts.append(text)
 					break
 
-		paragraphs = filter(None, paragraphs)
+		paragraphs = [paragraph for paragraph in paragraphs if paragraph]
 
 		return paragraphs
 
@@ -235,14 +272,14 @@ class MyPile(object):
 	def _get_instruction(self):
 		for text in self.texts:
 			fontname = text._objs[0].fontname
-			#print '_get_instruction: fontname='+fontname +'; text.height='+str(text.height) +'; content='+text.get_text().encode('utf8').strip()
+			#print '_get_instruction: fontname='+fontname +'; text.height='+str(text.height) +'; content='+text.get_text().strip()
 				
 			if ((text.height > 14.5) and (fontname.endswith('NeoSansIntelMedium'))):
-				content = text.get_text().encode('utf8').strip()
+				content = text.get_text().strip()
 				#print '_get_instruction: text.height='+str(text.height) +'; content='+content
 	
 				searchChar = '—'
-				#searchChar = '\xe2\x80\x94'
+				#searchChar = '\u2014'
 				if (re.search(searchChar, content)):
 					tmp = content.split(searchChar)
 					instruction = tmp[0].strip()
@@ -300,27 +337,32 @@ class MyPile(object):
 		return '\n### '+text+'\n'
 
 	@staticmethod
-	def mycmp(x, y):
-		if (x.y1 < y.y1):
-			return -1
-		elif (x.y1 > y.y1):
-			return 1
-		else:
-			if (x.x0 < y.x0):
-				return 1
-			elif (x.x0 > y.x0):
-				return -1
-			else:
-				return 0
+	def reading_order_key(text):
+		# sorted with reverse=True: from top to bottom, and on the same top from left to right
+		return (text.y1, -text.x0)
+
+
+	def _rank_texts(self):
+		ranks = {}
+		for rank, text in enumerate(sorted(self.texts, key=Pile.reading_order_key, reverse=True)):
+			ranks[text] = rank
+		return ranks
+
+
+	def _reading_order(self):
+		# the texts in reading order; self.texts stays in layout order, as get_key and _get_instruction look at its first texts
+		if self.ranks == None:
+			self.ranks = self._rank_texts()
+		return sorted(self.texts, key=self.ranks.__getitem__)
 
 	def _gen_paragraph_markdown(self, state):
 		markdown = ''
 		previousHeight = 0
 		counter = 0;
 
-		for text in sorted(self.texts, cmp=Pile.mycmp, reverse=True):
+		for text in self._reading_order():
 
-			content2 = text.get_text().encode('utf8')
+			content2 = text.get_text()
 			#print 'content2='+content2
 			
 			if (counter == 0):
@@ -353,11 +395,11 @@ class MyPile(object):
 					#print('found "5 -" in main text '+content2)
 					pass
 	
-			content = content2.strip().replace('#', '\#').replace('*', '\*')
+			content = content2.strip().replace('#', r'\#').replace('*', r'\*')
 			#print 'content='+content
 
 				
-			if re.search('\xe2\x80\x94', content):
+			if re.search('—', content):
 				#print('found "\xe2\x80\x94" with height '+str(text.height))
 
 				if (text.height < 10.0):
@@ -369,43 +411,32 @@ class MyPile(object):
 					state.type_next = 'title'
 					instruction = instruction.replace('/', ' / ')
 					#markdown += '\n\n#' + ' ' +  instruction +'\n\n'
-					markdown += '<b>'+instruction + '</b> \xe2\x80\x94 '  + descr + '\n'
+					markdown += '<b>'+instruction + '</b> — '  + descr + '\n'
 					continue
 
-			if (content == 'Description') or (content=='IA-32 Architecture Compatibility'):
+			section = Pile.SECTIONS.get(content)
+
+			if section == 'description':
 				state.type_next = 'description'
 				markdown += Pile._header(content)
 
-			elif (content == 'Instruction Operand Encoding'):
+			elif section == 'encoding':
 				state.type_next = 'encoding'
 				markdown += Pile._header(content)
 
-			elif content == 'Operation':
+			elif section == 'operation':
 				state.type_next = 'operation'
 				markdown += Pile._header(content) + '\n'
 
-			elif (content == 'Flags Affected') or (content == 'FPU Flags Affected'):
+			elif section == 'flags':
 				state.type_next = 'flags'
 				markdown += Pile._close_code(state) + Pile._header(content)
 
-			elif (content == 'Intel C/C++ Compiler Intrinsic Equivalent') or (content == 'C/C++ Compiler Intrinsic Equivalent'):
+			elif section == 'intrinsics':
 				state.type_next = 'intrinsics'
 				markdown += Pile._close_code(state) + Pile._header(content) + Pile._start_code(state, 'c')
 
-			elif (content == 'Other Exceptions') or \
-				 (content == 'Compatibility Mode Exceptions') or \
-				 (content == '64-Bit Mode Exceptions') or \
-				 (content == 'Exceptions (All Operating Modes)') or \
-				 (content == 'Floating-Point Exceptions') or \
-				 (content == 'Other Mode Exceptions') or \
-				 (content == 'Virtual-8086 Mode Exceptions') or \
-				 (content == 'SIMD Floating-Point Exceptions') or \
-				 (content == 'SIMD Floating Point Exceptions') or \
-				 (content == 'Protected Mode Exceptions') or \
-				 (content == 'Exceptions') or \
-				 (content == 'Numeric Exceptions') or \
-				 (content == 'Virtual 8086 Mode Exceptions') or \
-				 (content == 'Real-Address Mode Exceptions'):
+			elif section == 'exceptions':
 				state.type_next = 'exceptions'
 				markdown += Pile._close_code(state) + Pile._header(content)
 
@@ -439,12 +470,12 @@ class MyPile(object):
 					markdown += Pile._par(myheight) + content + '\n'
 
 				elif state.type == 'exceptions':
-					if re.search('\#', content):
-						if re.search('\(\#', content): 
+					if re.search(r'\#', content):
+						if re.search(r'\(\#', content): 
 							print('Pile:_gen_paragraph_markdown: not changing "(#"')
 							#pass
 						else:
-							content = content.replace('\#', '<p>#')
+							content = content.replace(r'\#', '<p>#')
 
 
 					myheight = previousHeight - text.y1;
@@ -457,11 +488,32 @@ class MyPile(object):
 		return markdown
 
 
+	def gen_table_rows(self):
+		rows = []
+		for row in self._get_table_intermediate():
+			cells = []
+			for cell in row:
+				content = {'text': ' '.join([text.get_text().strip() for text in cell['texts']])}
+				if 'colspan' in cell:
+					content['colspan'] = cell['colspan']
+				if 'rowspan' in cell:
+					content['rowspan'] = cell['rowspan']
+				cells.append(content)
+			rows.append(cells)
+		return rows
+
+
 	def _gen_table_markdown(self, state):
-		intermediate = self._gen_table_intermediate()
+		intermediate = list(self._get_table_intermediate())
 		return self._intermediate_to_markdown(intermediate, state)
 
 
+	def _get_table_intermediate(self):
+		if self._intermediate == None:
+			self._intermediate = self._gen_table_intermediate()
+		return self._intermediate
+
+
 	def _gen_table_intermediate(self):
 		vertical_coor = self._calc_coordinates(self.verticals, 'x0', False)
 		horizontal_coor = self._calc_coordinates(self.horizontals, 'y0', True)
@@ -495,17 +547,32 @@ class MyPile(object):
 		return intermediate
 
 
+	def _get_ranked(self):
+		# the texts in reading order, their y1 negated for bisect, and their index in self.texts
+		if self._ranked == None:
+			texts = self._reading_order()
+			positions = dict((text, idx) for idx, text in enumerate(self.texts))
+			self._ranked = (texts, [-text.y1 for text in texts], positions)
+		return self._ranked
+
+
 	def _find_cell_texts(self, left, top, right, bottom):
+		# only the texts with a y1 between the bottom and the top of the cell can be in it; in reading order,
+		# they are a range that is found with bisect
+		ranked_texts, keys, positions = self._get_ranked()
+		start = bisect.bisect_left(keys, -(top + self._SEARCH_DISTANCE_HORIZONTAL))
+		end = bisect.bisect_right(keys, -(bottom - self._SEARCH_DISTANCE_HORIZONTAL))
+
 		texts = []
-		for text in self.texts:
+		for text in sorted(ranked_texts[start:end], key=positions.__getitem__):
 			if self._in_range(left, top, right, bottom, text):
-				content = text.get_text().encode('utf8').strip()
-				#if re.search('\xe2\x89\xA0', content): # unequal sign
+				content = text.get_text().strip()
+				#if re.search('\u2260', content): # unequal sign
 				#	print 'Pile:_find_cell_texts: in range: content='+content
 				texts.append(text)
 			else: 
-				#content = text.get_text().encode('utf8').strip()
-				#if re.search('\xe2\x89\xA0', content): # unequal sign
+				#content = text.get_text().strip()
+				#if re.search('\u2260', content): # unequal sign
 				#	print 'Pile:_find_cell_texts: not in range: content='+content
 				pass
 		return texts
@@ -634,7 +701,7 @@ class MyPile(object):
 
 	def _create_td_tag(self, cell, firstLine):
 		indent = '\t' * 2
-		texts = [text.get_text().encode('utf8').strip() for text in cell['texts']]
+		texts = [text.get_text().strip() for text in cell['texts']]
 		texts = ' '.join(texts)
 
 		#print '_create_td_tag: texts='+texts
@@ -664,7 +731,7 @@ class MyPile(object):
 	def _is_opcode_table(self):
 		if (self._is_table()):
 			if (len(self.texts) > 0):
-				first_word = self.texts[0].get_text().encode('utf8').strip()
+				first_word = self.texts[0].get_text().strip()
 				#print '_is_opcode_table first_word ', first_word
 				if (first_word == 'Opcode'):
 					return True
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import cProfile
+from timeit import default_timer
+from contextlib import contextmanager
+from inteldoc2md.parser import Parser
+from inteldoc2md.writer import Writer
+from inteldoc2md.corpus import Corpus
+
+
+class StackProfiler(object):
+	# Records every python and builtin call with sys.setprofile, and writes the own time of every call stack in the
+	# collapsed format that flamegraph.pl, speedscope and inferno read: a line 'root;module.function;... microseconds'
+	# per stack. Every call is seen, so small functions that are called often, such as the geometry helpers of Pile,
+	# weigh a bit more than they would without profiling.
+
+	def __init__(self):
+		self.stacks = {}
+		self._names = {}
+		self._stack = []
+
+
+	@contextmanager
+	def profile(self, root=None):
+		# root: the name of the frame that the profiled stacks are put under, such as 'page_35'
+		self._stack = [[[root] if (root != None) else [], default_timer(), 0.0]]
+		sys.setprofile(self._trace)
+		try:
+			yield
+		finally:
+			sys.setprofile(None)
+			# what is still on the stack is the profile() call itself
+			self._stack = []
+
+
+	def save(self, filename):
+		fwrite = open(filename, 'w')
+		for stack in sorted(self.stacks.keys()):
+			microseconds = int(round(self.stacks[stack] * 1000000))
+			if microseconds > 0:
+				fwrite.write(stack + ' ' + str(microseconds) + '\n')
+		fwrite.close()
+		print('writing ' + filename)
+
+
+	def _trace(self, frame, event, arg):
+		now = default_timer()
+		if event == 'call':
+			self._push(self._name(frame.f_code), now)
+		elif event == 'c_call':
+			self._push(self._builtin_name(arg), now)
+		elif (event in ['return', 'c_return', 'c_exception']) and (len(self._stack) > 1):
+			names, start, children = self._stack.pop()
+			elapsed = now - start
+			stack = ';'.join(names)
+			self.stacks[stack] = self.stacks.get(stack, 0.0) + (elapsed - children)
+			self._stack[-1][2] += elapsed
+
+
+	def _push(self, name, now):
+		self._stack.append([self._stack[-1][0] + [name], now, 0.0])
+
+
+	def _name(self, code):
+		name = self._names.get(code)
+		if name == None:
+			name = os.path.splitext(os.path.basename(code.co_filename))[0] + '.' + code.co_name
+			self._names[code] = name
+		return name
+
+
+	def _builtin_name(self, function):
+		module = getattr(function, '__module__', None)
+		if module == None:
+			self_type = type(getattr(function, '__self__', None))
+			module = self_type.__name__ if (self_type != type(None)) else 'builtins'
+		return module + '.' + getattr(function, '__name__', '?')
+
+
+class CProfiler(object):
+	# cProfile, for pstats, snakeviz and gprof2dot; every profiled part is added to the same statistics
+
+	def __init__(self):
+		self._profile = cProfile.Profile()
+
+
+	@contextmanager
+	def profile(self, root=None):
+		self._profile.enable()
+		try:
+			yield
+		finally:
+			self._profile.disable()
+
+
+	def save(self, filename):
+		self._profile.dump_stats(filename)
+		print('writing ' + filename)
+
+
+def create_profiler(format):
+	if format == 'pstats':
+		return CProfiler()
+	return StackProfiler()
+
+
+def profile_pages(filename, page_numbers, profiler):
+	# runs the pipeline again for every page on its own, from the pdf page to its markdown, under the profiler;
+	# reading the pdf document is not profiled
+	for page_number in page_numbers:
+		parser = Parser(filename)
+		with profiler.profile('page_' + str(page_number)):
+			parser.extract(page_number, page_number + 1)
+			Writer(Corpus()).write(parser.parse())
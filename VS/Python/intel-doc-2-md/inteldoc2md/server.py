@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+import json
+import inspect
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import unquote
+
+
+# The queries the server answers, over plain HTTP and over JSON-RPC 2.0:
+#   GET /markdown/VPERMQ          {"method": "markdown", "params": ["VPERMQ"]}          the page of VPERMQ as markdown
+#   GET /opcodes/MOV              {"method": "opcodes", "params": ["MOV"]}              the opcode table rows of MOV
+#   GET /section/Flags%20Affected {"method": "section", "params": ["Flags Affected"]}   the pages with a section
+#   GET /instructions             {"method": "instructions", "params": []}              the names of all pages
+# The params of a JSON-RPC request are positional, or named after the parameters of the Corpus method:
+#   {"method": "markdown", "params": {"mnemonic": "VPERMQ"}}
+_METHODS = ['markdown', 'opcodes', 'section', 'instructions']
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+
+	corpus = None
+
+	def do_GET(self):
+		parts = self.path.split('?')[0].strip('/').split('/', 1)
+		method = parts[0]
+		params = [unquote(parts[1])] if (len(parts) > 1) else []
+
+		if method not in _METHODS:
+			self._reply(404, 'application/json', json.dumps({'error': 'unknown query ' + method, 'queries': _METHODS}))
+			return
+		try:
+			bound = self._bind(method, params)
+		except TypeError:
+			self._reply(400, 'application/json', json.dumps({'error': 'wrong number of parameters for ' + method}))
+			return
+		try:
+			result = getattr(_RequestHandler.corpus, method)(*bound.args, **bound.kwargs)
+		except Exception as e:
+			self._reply(500, 'application/json', json.dumps({'error': 'internal error: ' + str(e)}))
+			return
+
+		if method == 'markdown':
+			if result == None:
+				self._reply(404, 'text/markdown; charset=utf-8', '')
+			else:
+				self._reply(200, 'text/markdown; charset=utf-8', result)
+		else:
+			self._reply(200, 'application/json', json.dumps(result))
+
+
+	def do_POST(self):
+		length = int(self.headers.get('Content-Length', 0))
+		response = self._rpc(self.rfile.read(length))
+		if response == None:
+			self.send_response(204)
+			self.end_headers()
+			return
+		self._reply(200, 'application/json', json.dumps(response))
+
+
+	def _rpc(self, body):
+		# the response to a JSON-RPC 2.0 request, with the error codes of the specification; None for a
+		# notification, a request without an id, which is not answered
+		try:
+			request = json.loads(body)
+		except ValueError as e:
+			return _error(None, -32700, 'Parse error: ' + str(e))
+		if (not isinstance(request, dict)) or (not isinstance(request.get('method'), str)):
+			return _error(request.get('id') if isinstance(request, dict) else None, -32600, 'Invalid Request')
+		response = self._call(request)
+		return response if ('id' in request) else None
+
+
+	def _call(self, request):
+		request_id = request.get('id')
+		method = request['method']
+		if method not in _METHODS:
+			return _error(request_id, -32601, 'Method not found: ' + method)
+		try:
+			bound = self._bind(method, request.get('params', []))
+		except TypeError as e:
+			return _error(request_id, -32602, 'Invalid params: ' + str(e))
+		try:
+			result = getattr(_RequestHandler.corpus, method)(*bound.args, **bound.kwargs)
+		except Exception as e:
+			return _error(request_id, -32603, 'Internal error: ' + str(e))
+		return {'jsonrpc': '2.0', 'id': request_id, 'result': result}
+
+
+	def _bind(self, method, params):
+		# raises TypeError when params do not fit the parameters of the method
+		signature = inspect.signature(getattr(_RequestHandler.corpus, method))
+		if isinstance(params, dict):
+			return signature.bind(**params)
+		if isinstance(params, list):
+			return signature.bind(*params)
+		raise TypeError('params must be an array or an object')
+
+
+	def _reply(self, code, content_type, content):
+		content = content.encode('utf8')
+		self.send_response(code)
+		self.send_header('Content-Type', content_type)
+		self.send_header('Content-Length', str(len(content)))
+		self.end_headers()
+		self.wfile.write(content)
+
+
+	def log_message(self, format, *args):
+		pass
+
+
+def _error(request_id, code, message):
+	return {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': code, 'message': message}}
+
+
+def serve(corpus, host='127.0.0.1', port=8765):
+	_RequestHandler.corpus = corpus
+	server = HTTPServer((host, port), _RequestHandler)
+	print('serving ' + str(len(corpus.pages)) + ' pages on http://' + host + ':' + str(server.server_port))
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	server.server_close()
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+
+
+# Arch names as ArchTools.ParseArch (asm-tools-lib) accepts them, without underscores, mapped onto ArchTools.ToString
+_ARCHS = {
+	'8086': '8086', '186': '186', '286': '286', '386': '386', '486': '486', 'PENT': 'PENT', 'P6': 'P6',
+	'MMX': 'MMX', 'SSE': 'SSE', 'SSE2': 'SSE2', 'SSE3': 'SSE3', 'SSSE3': 'SSSE3', 'SSE41': 'SSE4_1', 'SSE42': 'SSE4_2', 'SSE4A': 'SSE4A', 'SSE5': 'SSE5',
+	'AVX': 'AVX', 'AVX2': 'AVX2',
+	'AVX512VL': 'AVX512_VL', 'AVX512DQ': 'AVX512_DQ', 'AVX512BW': 'AVX512_BW', 'AVX512ER': 'AVX512_ER', 'AVX512F': 'AVX512_F',
+	'AVX512CD': 'AVX512_CD', 'AVX512PF': 'AVX512_PF', 'AVX512IFMA': 'AVX512_IFMA', 'AVX512VBMI': 'AVX512_VBMI',
+	'AVX512VPOPCNTDQ': 'AVX512_VPOPCNTDQ', 'AVX5124VNNIW': 'AVX512_4VNNIW', 'AVX5124FMAPS': 'AVX512_4FMAPS',
+	'VBMI2': 'AVX512_VBMI2', 'AVX512VBMI2': 'AVX512_VBMI2', 'VNNI': 'AVX512_VNNI', 'AVX512VNNI': 'AVX512_VNNI',
+	'BITALG': 'AVX512_BITALG', 'AVX512BITALG': 'AVX512_BITALG', 'GFNI': 'AVX512_GFNI', 'AVX512GFNI': 'AVX512_GFNI',
+	'VAES': 'AVX512_VAES', 'AVX512VAES': 'AVX512_VAES', 'VPCLMULQDQ': 'AVX512_VPCLMULQDQ', 'AVX512VPCLMULQDQ': 'AVX512_VPCLMULQDQ',
+	'AVX512BF16': 'AVX512_BF16', 'AVX512VP2INTERSECT': 'AVX512_VP2INTERSECT',
+	'HLE': 'HLE', 'BMI1': 'BMI1', 'BMI2': 'BMI2', 'FMA': 'FMA', 'AES': 'AES', 'TBM': 'TBM', 'AMD': 'AMD', '3DNOW': '3DNOW',
+	'IA64': 'IA64', 'CYRIX': 'CYRIX', 'CYRIXM': 'CYRIXM', 'INVPCID': 'INVPCID', 'VMX': 'VMX', 'ADX': 'ADX', 'X64': 'X64',
+	'PCLMULQDQ': 'PCLMULQDQ', 'RDPID': 'RDPID', 'RDRAND': 'RDRAND', 'RDSEED': 'RDSEED',
+	'XSAVEOPT': 'XSAVEOPT', 'XSS': 'XSAVEOPT', 'XSAVE': 'XSAVEOPT', 'XSAVEC': 'XSAVEOPT',
+	'FSGSBASE': 'FSGSBASE', 'LZCNT': 'LZCNT', 'F16C': 'F16C', 'MPX': 'MPX', 'SHA': 'SHA', 'RTM': 'RTM',
+	'PREFETCHWT1': 'PREFETCHWT1', 'PRFCHW': 'PRFCHW', 'SGX1': 'SGX1', 'SGX2': 'SGX2', 'SMX': 'SMX',
+	'CLDEMOTE': 'CLDEMOTE', 'MOVDIR64B': 'MOVDIR64B', 'MOVDIRI': 'MOVDIRI', 'PCONFIG': 'PCONFIG', 'WAITPKG': 'WAITPKG',
+	'ENQCMD': 'ENQCMD', 'UNDOC': 'UNDOC',
+}
+
+# tokens in the opcode column that look like a mnemonic but are part of the encoding
+_NOT_MNEMONIC = set(['REX', 'NP', 'NFX', 'VEX', 'EVEX', 'XOP'])
+_MNEMONIC = re.compile('^[A-Z][A-Z0-9_]+$')
+_HEX_BYTE = re.compile('^[0-9A-F]{2}$')
+
+_ABBREVIATIONS = [
+	('floating-point', 'FP'), ('floating- point', 'FP'), ('Floating-Point', 'FP'), ('Floating- Point', 'FP'),
+	('double-precision', 'DP'), ('double- precision', 'DP'), ('Double-Precision', 'DP'), ('Double- Precision', 'DP'),
+	('single-precision', 'SP'), ('single- precision', 'SP'), ('Single-Precision', 'SP'), ('Single- Precision', 'SP'),
+]
+
+
+class SignatureWriter(object):
+	# Writes the tab separated signature file that MnemonicStore.LoadRegularData reads (see signature-may2019.txt),
+	# directly from the opcode tables, instead of intel-doc-2-data re-parsing the md files from the wiki.
+
+	def __init__(self, filename='./output/signature.txt'):
+		self.filename = filename
+		self._pages = {}
+
+
+	def open(self):
+		self._pages = {}
+
+
+	def add_page(self, name, instruction, description, rows):
+		# rows: the cells of the opcode table of this page as strings, the first row is the header
+		if not rows:
+			return
+		signatures = SignatureWriter._to_signatures(rows, SignatureWriter._page_mnemonics(instruction))
+
+		mnemonics = []
+		for signature in signatures:
+			if signature[0] not in mnemonics:
+				mnemonics.append(signature[0])
+
+		lines = [';--------------------------------------------------------']
+		for mnemonic in mnemonics:
+			lines.append('GENERAL\t' + mnemonic + '\t' + description + '\t' + name)
+			for signature in signatures:
+				if signature[0] == mnemonic:
+					lines.append('\t'.join(signature))
+		self._pages[name] = lines
+
+
+	def close(self):
+		# same order as intel-doc-2-data, which enumerated the md files sorted on filename
+		fwrite = open(self.filename + '.tmp', 'w', encoding='utf8')
+		for name in sorted(self._pages.keys()):
+			for line in self._pages[name]:
+				fwrite.write(line + '\n')
+		fwrite.close()
+		os.replace(self.filename + '.tmp', self.filename)
+		print('writing ' + self.filename)
+
+
+	@staticmethod
+	def instruction_forms(rows, instruction):
+		# (cell, mnemonic, form) for every row of the opcode table, eg ('VEX.128.F2.0F38.W0 5E 11:rrr:bbb TDPBSSD tmm1, tmm2, tmm3', 'TDPBSSD', 'TDPBSSD TMM1,TMM2,TMM3')
+		mnemonic_column = SignatureWriter._columns(rows[0])[0]
+		page_mnemonics = SignatureWriter._page_mnemonics(instruction)
+		forms = []
+		for row in rows[1:]:
+			if (mnemonic_column < 0) or (mnemonic_column >= len(row)):
+				break
+			mnemonic, parameters, parameter_descriptions = SignatureWriter._parse_parameters(row[mnemonic_column], page_mnemonics)
+			if mnemonic != None:
+				forms.append((row[mnemonic_column], mnemonic, parameter_descriptions))
+		return forms
+
+
+	@staticmethod
+	def description(markdown):
+		# the text between the hyphen in the title and the first table
+		pos = markdown.find('<table>')
+		header = markdown[:pos] if (pos != -1) else markdown
+		for hyphen in ['—', '–', '-']:
+			pos = header.find(hyphen)
+			if pos != -1:
+				return header[pos + len(hyphen):].strip().replace('\n', ' ')
+		return header.strip().replace('\n', ' ')
+
+
+	@staticmethod
+	def _page_mnemonics(instruction):
+		return set(str(instruction).replace('/', ' ').upper().split())
+
+
+	@staticmethod
+	def _columns(header):
+		# returns mnemonic_column, arch_column, description_column; arch_column -1 means: derive the arch from
+		# the operands, -10 means: SMX
+		if len(header) == 6:
+			if header[1] == 'Instruction':
+				return 1, -1, 5
+			return 0, 4, 5
+		elif len(header) == 5:
+			if 'Instruction' in header[0]:
+				columns = [0, 3, 4]
+			elif 'Instruction' in header[1]:
+				columns = [1, -1, 4]
+			else:
+				columns = [0, 3, 4]
+			if 'CPUID' in header[3]:
+				columns[1] = 3
+			return tuple(columns)
+		elif len(header) == 4:
+			return 0, -1, 3
+		elif len(header) == 3:
+			return 1, -10, 2
+		print('WARNING: SignatureWriter: found header count ' + str(len(header)) + '.')
+		return -2, -2, -2
+
+
+	@staticmethod
+	def _to_signatures(rows, page_mnemonics):
+		mnemonic_column, arch_column, description_column = SignatureWriter._columns(rows[0])
+
+		signatures = []
+		for row in rows[1:]:
+			if (mnemonic_column < 0) or (mnemonic_column >= len(row)):
+				print('WARNING: SignatureWriter: malformed row')
+				break
+			mnemonic, parameters, parameter_descriptions = SignatureWriter._parse_parameters(row[mnemonic_column], page_mnemonics)
+			if mnemonic == None:
+				print('WARNING: SignatureWriter: could not find a mnemonic in ' + row[mnemonic_column])
+				continue
+
+			if arch_column == -1:
+				archs = SignatureWriter._derive_archs(parameter_descriptions)
+			elif arch_column == -10:
+				archs = ['SMX']
+			elif arch_column < len(row):
+				archs = SignatureWriter._parse_archs(row[arch_column])
+			else:
+				archs = ['NONE']
+
+			description = row[description_column] if (description_column < len(row)) else ''
+			for long_name, short_name in _ABBREVIATIONS:
+				description = description.replace(long_name, short_name)
+
+			signatures.append([mnemonic, parameters, ','.join(archs), parameter_descriptions, description])
+		return signatures
+
+
+	@staticmethod
+	def _parse_parameters(cell, page_mnemonics):
+		str2 = ' ' + cell.replace('*', '').strip() + ' '
+		str2 = str2.replace('REP ', 'REP_').replace('REPE ', 'REPE_').replace('REPNE ', 'REPNE_')
+		tokens = str2.split()
+
+		# prefer the mnemonics from the title of the page, CMOVcc and friends are found by their shape
+		mnemonic_idx = None
+		for idx, token in enumerate(tokens):
+			if token.strip('[]').upper() in page_mnemonics:
+				mnemonic_idx = idx
+				break
+		if mnemonic_idx == None:
+			for idx, token in enumerate(tokens):
+				candidate = token.strip('[]')
+				if _MNEMONIC.match(candidate) and (not _HEX_BYTE.match(candidate)) and (candidate not in _NOT_MNEMONIC):
+					mnemonic_idx = idx
+					break
+		if mnemonic_idx == None:
+			return None, '', ''
+
+		mnemonic = tokens[mnemonic_idx].strip('[]').upper()
+		tmp = ''.join(tokens[mnemonic_idx + 1:]).replace('[', '').replace(']', '').upper()
+		parameters = SignatureWriter._cleanup_parameters(tmp)
+		parameter_descriptions = (mnemonic + ' ' + tmp) if tmp else mnemonic
+		return mnemonic, parameters, parameter_descriptions
+
+
+	@staticmethod
+	def _cleanup_parameters(str):
+		str = str.replace('IMM16', 'XYZZY')
+		for old, new in [('+3', ''),
+				('XMM1', 'XMM'), ('XMM2', 'XMM'), ('XMM3', 'XMM'), ('XMM4', 'XMM'),
+				('YMM1', 'YMM'), ('YMM2', 'YMM'), ('YMM3', 'YMM'), ('YMM4', 'YMM'),
+				('ZMM1', 'ZMM'), ('ZMM2', 'ZMM'), ('ZMM3', 'ZMM'),
+				('MM1', 'MM'), ('MM2', 'MM'),
+				('<XMM0>', 'XMM_ZERO'),
+				('BND1', 'BND'), ('BND2', 'BND'),
+				('K1', 'K'), ('K2', 'K'), ('K3', 'K'),
+				('R32A', 'R32'), ('R32B', 'R32'), ('R64A', 'R64'), ('R64B', 'R64')]:
+			str = str.replace(old, new)
+		return str.replace('XYZZY', 'IMM16')
+
+
+	@staticmethod
+	def _parse_archs(str):
+		archs = []
+		for s in str.replace(',', ' ').split(' '):
+			arch = _ARCHS.get(s.strip().upper().replace('_', ''))
+			if arch != None:
+				archs.append(arch)
+		return archs
+
+
+	@staticmethod
+	def _derive_archs(parameter_descriptions):
+		descr = ' ' + parameter_descriptions
+		if ' CMOV' in descr:
+			return ['X64'] if ('R64' in descr) else ['P6']
+		elif ('REL16' in descr) or ('REL32' in descr):
+			return ['386']
+		elif 'REL64' in descr:
+			return ['X64']
+		elif ('M64' in descr) or ('R64' in descr) or ('RCX' in descr):
+			return ['X64']
+		elif ('IMM32' in descr) or ('M32' in descr) or ('R32' in descr) or ('ECX' in descr):
+			return ['386']
+		return ['8086']
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import time
+from contextlib import contextmanager
+import tracemalloc
+try:
+	import resource
+except ImportError:
+	resource = None # windows: no peak rss
+
+
+# the stages of the pipeline, in order
+STAGES = ['layout', 'split', 'tables', 'markdown', 'write']
+
+
+class Stats(object):
+	# Wall and CPU time, and allocations, per stage and per pdf page, and counts of what the pipeline made:
+	#   layout:   pdfminer, from a pdf page to its layout
+	#   split:    parse_layout and split_piles, from a layout to piles
+	#   tables:   the intermediate of the table piles, the cells and their texts
+	#   markdown: the markdown of the piles, the tables without their intermediate
+	#   write:    storing the pages in the backend and closing it
+	# Allocations are the peak of traced memory during a stage, above what was allocated when it started.
+	# Tracing makes the pipeline several times slower; the times are measured with it.
+
+	def __init__(self, trace_memory=True):
+		self.trace_memory = trace_memory
+		self.stages = dict((stage, {'calls': 0, 'wall': 0.0, 'cpu': 0.0, 'allocated': None}) for stage in STAGES)
+		self.pages = {}
+		self.counts = {'pages': 0, 'piles': 0, 'tables': 0, 'cells': 0, 'texts': 0, 'instructions': 0}
+		self._start = None
+
+
+	def start(self):
+		if self.trace_memory and (not tracemalloc.is_tracing()):
+			tracemalloc.start()
+		self._start = (time.time(), time.process_time())
+
+
+	def stop(self):
+		self.wall = time.time() - self._start[0]
+		self.cpu = time.process_time() - self._start[1]
+		if self.trace_memory:
+			self.peak_traced = tracemalloc.get_traced_memory()[1]
+			tracemalloc.stop()
+
+
+	@contextmanager
+	def measure(self, stage, page=None):
+		if self.trace_memory:
+			tracemalloc.reset_peak()
+			allocated_start = tracemalloc.get_traced_memory()[0]
+		wall_start = time.time()
+		cpu_start = time.process_time()
+		try:
+			yield
+		finally:
+			wall = time.time() - wall_start
+			cpu = time.process_time() - cpu_start
+			entry = self.stages[stage]
+			entry['calls'] += 1
+			entry['wall'] += wall
+			entry['cpu'] += cpu
+			if self.trace_memory:
+				allocated = tracemalloc.get_traced_memory()[1] - allocated_start
+				entry['allocated'] = max(entry['allocated'] or 0, allocated)
+			if page != None:
+				page_entry = self.pages.setdefault(page, {'wall': 0.0, 'cpu': 0.0, 'stages': {}})
+				page_entry['wall'] += wall
+				page_entry['cpu'] += cpu
+				page_entry['stages'][stage] = page_entry['stages'].get(stage, 0.0) + wall
+
+
+	def count(self, name, n=1):
+		self.counts[name] = self.counts.get(name, 0) + n
+
+
+	def report(self):
+		report = {'wall': self.wall, 'cpu': self.cpu, 'stages': self.stages, 'counts': self.counts}
+		report['pages'] = dict((str(page), entry) for page, entry in self.pages.items())
+		report['peak_traced'] = self.peak_traced if self.trace_memory else None
+		report['peak_rss'] = Stats._peak_rss()
+		return report
+
+
+	def save(self, filename):
+		fwrite = open(filename, 'w')
+		fwrite.write(json.dumps(self.report(), indent=1, sort_keys=True))
+		fwrite.close()
+		print('writing ' + filename)
+
+
+	def summary(self, top=10):
+		lines = ['stage     calls     wall      cpu   allocated']
+		for stage in STAGES:
+			entry = self.stages[stage]
+			allocated = '-' if (entry['allocated'] == None) else (str(entry['allocated'] // 1024) + ' KiB')
+			lines.append('%-8s %6d %8.2fs %7.2fs %11s' % (stage, entry['calls'], entry['wall'], entry['cpu'], allocated))
+		lines.append('total           %8.2fs %7.2fs' % (self.wall, self.cpu))
+		lines.append(', '.join(name + ' ' + str(self.counts[name]) for name in sorted(self.counts.keys())))
+
+		slowest = sorted(self.pages.items(), key=lambda item: item[1]['wall'], reverse=True)[:top]
+		if slowest:
+			lines.append('slowest pages:')
+		for page, entry in slowest:
+			stages = ', '.join(stage + ' ' + ('%.3f' % entry['stages'][stage]) for stage in STAGES if stage in entry['stages'])
+			lines.append('  page %4d %8.3fs  (%s)' % (page, entry['wall'], stages))
+		return '\n'.join(lines)
+
+
+	@staticmethod
+	def _peak_rss():
+		# in bytes; ru_maxrss is in KiB on linux and in bytes on macos
+		if resource == None:
+			return None
+		peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+		return peak if (os.uname()[0] == 'Darwin') else peak * 1024
+
+
+@contextmanager
+def measure(stats, stage, page=None):
+	# measures when there are stats, such that the pipeline runs without them as before
+	if stats == None:
+		yield
+	else:
+		with stats.measure(stage, page):
+			yield
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import time
+import traceback
+from importlib import reload
+
+
+# the modules in the order they are reloaded, every module after the modules it imports
+_MODULES = ['pile', 'stats', 'parser', 'asyncwriter', 'backend', 'signature', 'writer', 'document', 'index', 'corpus', 'server', 'profiler']
+
+
+class Watcher(object):
+	# Keeps the layouts of the pdf pages and the piles split from them in memory, polls the pdf and the inteldoc2md
+	# modules, and on a change runs again only the stages after it:
+	#   the pdf:        extract the pages whose content changed, split them, render
+	#   parser.py:      take over the cached layouts without pdfminer, split all pages, render
+	#   pile.py:        split all cached layouts, render
+	#   other modules:  render the cached piles
+
+	def __init__(self, filename, create_writer, interval=1.0):
+		# create_writer: returns the Writer to render with; it is called again after every reload,
+		# so it should look the classes up in the (reloaded) inteldoc2md package
+		self.filename = filename
+		self.create_writer = create_writer
+		self.interval = interval
+		self._parser = None
+		self._piles = {}
+		self._mtimes = {}
+
+
+	def run(self):
+		self._mtimes = self._get_mtimes()
+		self._extract()
+		self._split(False)
+		self._render()
+		print('watching ' + self.filename + ' and the inteldoc2md modules, press Ctrl+C to stop')
+		try:
+			while True:
+				time.sleep(self.interval)
+				self.poll()
+		except KeyboardInterrupt:
+			pass
+
+
+	def poll(self):
+		# one check for changes; returns the first stage that ran again: None, 'extract', 'split' or 'render'
+		mtimes = self._get_mtimes()
+		changed = [key for key in mtimes.keys() if mtimes[key] != self._mtimes.get(key)]
+		if not changed:
+			return None
+		self._mtimes = mtimes
+		print('changed: ' + ', '.join(sorted(changed)))
+
+		modules = [name for name in _MODULES if name in changed]
+		if (self.filename in changed) or ('parser' in modules):
+			stage = 'extract'
+		elif 'pile' in modules:
+			stage = 'split'
+		else:
+			stage = 'render'
+
+		# an error in an edited module, or a pdf that is still being written, is reported and the
+		# previous state is kept; the next change tries again
+		try:
+			if modules:
+				self._reload()
+			if stage == 'extract':
+				self._extract()
+			if stage in ['extract', 'split']:
+				self._split(('pile' in modules) or ('parser' in modules))
+			self._render()
+		except Exception:
+			traceback.print_exc()
+		return stage
+
+
+	def _get_mtimes(self):
+		# a file that is missing for a moment, while an editor saves it, has mtime None
+		directory = os.path.dirname(os.path.abspath(__file__))
+		filenames = [(self.filename, self.filename)] + [(name, os.path.join(directory, name + '.py')) for name in _MODULES]
+		mtimes = {}
+		for key, filename in filenames:
+			mtimes[key] = os.path.getmtime(filename) if os.path.isfile(filename) else None
+		return mtimes
+
+
+	def _reload(self):
+		for name in _MODULES:
+			reload(sys.modules['inteldoc2md.' + name])
+		reload(sys.modules['inteldoc2md'])
+
+
+	def _extract(self):
+		start = time.time()
+		parser = sys.modules['inteldoc2md.parser'].Parser(self.filename)
+		changed = parser.extract_changed(self._parser)
+		self._parser = parser
+		print('extracted ' + str(len(changed)) + ' pages in ' + ('%.2f' % (time.time() - start)) + 's')
+
+
+	def _split(self, all_pages):
+		# the piles are cached by the digest of the page they were split from
+		start = time.time()
+		piles = {}
+		for page_num, digest in enumerate(self._parser.page_digests()):
+			if (digest not in piles):
+				if (not all_pages) and (digest in self._piles):
+					piles[digest] = self._piles[digest]
+				else:
+					piles[digest] = self._parser.parse(page_num)
+		self._piles = piles
+		print('split ' + str(len(piles)) + ' pages in ' + ('%.2f' % (time.time() - start)) + 's')
+
+
+	def _render(self):
+		start = time.time()
+		piles = []
+		for digest in self._parser.page_digests():
+			piles += self._piles[digest]
+		self.create_writer().write(piles)
+		print('rendered ' + str(len(piles)) + ' piles in ' + ('%.2f' % (time.time() - start)) + 's')
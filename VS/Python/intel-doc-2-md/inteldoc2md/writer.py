@@ -1,8 +1,10 @@
-
+# -*- coding: utf-8 -*-
 import os
 import re
-import pdb
 import datetime
+from inteldoc2md.backend import DirectoryBackend, content_hash
+from inteldoc2md.signature import SignatureWriter
+from inteldoc2md.stats import measure
 
 class State(object):
 	def __init__(self):
@@ -12,9 +14,16 @@ class State(object):
 	
 class Writer(object):
 
-	def __init__(self):
+	def __init__(self, backend=None, signatures=None, documents=None, index=None, stats=None):
 		self.source = 'Intel® Architecture Instruction Set Extensions and Future Features Programming Reference (December 2020)'
 		#self.source = 'Intel® Architecture Software Developer\'s Manual (May 2018)'
+		self.backend = backend if (backend != None) else DirectoryBackend()
+		self.signatures = signatures
+		self.documents = documents
+		self.index = index
+		self.stats = stats
+		self._blocks = []
+		self._counts = {'created': 0, 'updated': 0, 'unchanged': 0}
 
 
 	@staticmethod
@@ -91,16 +100,61 @@ class Writer(object):
 
 		markdown = Writer._cleanup_hyphens(markdown)
 
-		filename = './output/' + str(instruction).replace('/', '_').replace(' ', '_') + '.md'
-		print('writing ' + filename)
-		fwrite = open(filename, 'w')
+		name = str(instruction).replace('/', '_').replace(' ', '_')
 
 		now = datetime.datetime.now()
 		generatedTime = str(now.day) + '-' + str(now.month) + '-' + str(now.year)
 		#generatedTime = '24-10-2017'
 		markdown += '\n --- \n<p align="right"><i>Source: '+self.source+'<br>Generated: '+generatedTime+'</i></p>\n'
-		fwrite.write(markdown)
-		fwrite.close()
+
+		with measure(self.stats, 'write'):
+			status = self.backend.store(name, instruction, self.source, markdown, content_hash(markdown), generatedTime)
+		self._counts[status] += 1
+		if (self.stats != None):
+			self.stats.count('instructions')
+
+		if (self.signatures != None):
+			self.signatures.add_page(name, instruction, SignatureWriter.description(markdown), Writer._signature_rows(self._blocks))
+		if (self.documents != None):
+			self.documents.add_page(name, instruction, self.source, self._blocks)
+		if (self.index != None):
+			self.index.add_page(name, instruction, markdown, Writer._signature_rows(self._blocks))
+		self._blocks = []
+
+
+	def _add_block(self, pile, state, markdown):
+		# keep what was generated for the page in a structured form, for the signatures, documents and index
+		if pile._is_table():
+			rows = [[dict(cell, text=Writer._cleanup_hyphens(cell['text'])) for cell in row] for row in pile.gen_table_rows()]
+			continued = state.curr_pile_is_opcode_table and state.prev_pile_is_opcode_table
+			self._blocks.append(('table', rows, continued))
+		else:
+			self._blocks.append(('text', Writer._cleanup_hyphens(markdown), False))
+
+
+	def _count(self, pile):
+		self.stats.count('piles')
+		self.stats.count('texts', len(pile.texts))
+		if pile._is_table():
+			self.stats.count('tables')
+			self.stats.count('cells', sum([len(row) for row in pile._get_table_intermediate()]))
+
+
+	@staticmethod
+	def _signature_rows(blocks):
+		# as intel-doc-2-data did: the signatures come from the first table of the page, which is
+		# the opcode table, including its continuations on the next pages
+		rows = []
+		for kind, payload, continued in blocks:
+			if kind != 'table':
+				continue
+			if not rows:
+				rows = list(payload)
+			elif continued:
+				rows += payload[1:]
+			else:
+				break
+		return [[cell['text'] for cell in row] for row in rows]
 
 
 	def write(self, piles):
@@ -125,35 +179,58 @@ class Writer(object):
 
 		markdown = ''
 
-		for i in range (0, len(piles)):
-			pile = piles[i]
-			pileInstruction, descr = pile._get_instruction()
-			#print 'pileInstruction ' + str(pileInstruction)
-
-			createNewFile = False
-			if (pileInstruction != None):
-				if (pileInstruction != instruction_curr):
-					createNewFile = True
-					instruction_prev = instruction_curr
-					instruction_curr = pileInstruction
-					#print 'instruction_prev=' + str(instruction_prev) +'; instruction_curr='+instruction_curr
+		self._counts = {'created': 0, 'updated': 0, 'unchanged': 0}
+		self._blocks = []
+		opened = []
+		try:
+			for sink in [self.backend, self.signatures, self.documents, self.index]:
+				if (sink != None):
+					sink.open()
+					opened.append(sink)
+
+			for i in range (0, len(piles)):
+				pile = piles[i]
+				pileInstruction, descr = pile._get_instruction()
+
+				createNewFile = False
+				if (pileInstruction != None):
+					if (pileInstruction != instruction_curr):
+						createNewFile = True
+						instruction_prev = instruction_curr
+						instruction_curr = pileInstruction
 			
-			state.curr_pile_is_opcode_table = pile._is_opcode_table()
-			if (state.curr_pile_is_opcode_table):
-				state.prev_pile_is_opcode_table = Writer._find_prev_opcode_table(i, piles, instruction_curr)
-				state.next_pile_is_opcode_table = Writer._find_next_opcode_table(i, piles, instruction_curr)
-			else:
-				state.prev_pile_is_opcode_table = False
-				state.next_pile_is_opcode_table = False
-
-			#print 'write: ', pile.texts[0].get_text().encode('utf8').strip()
-			#print 'write: ', state.prev_pile_is_opcode_table,' ',  state.curr_pile_is_opcode_table, ' ',  state.next_pile_is_opcode_table
-
-			if (createNewFile):
-				self.close_file(instruction_prev, markdown)
-				markdown = ''
-				state.prev_pile_is_opcode_table = False
-
-			markdown += pile.gen_markdown(state)
-
-		self.close_file(instruction_curr, markdown)
+				state.curr_pile_is_opcode_table = pile._is_opcode_table()
+				if (state.curr_pile_is_opcode_table):
+					state.prev_pile_is_opcode_table = Writer._find_prev_opcode_table(i, piles, instruction_curr)
+					state.next_pile_is_opcode_table = Writer._find_next_opcode_table(i, piles, instruction_curr)
+				else:
+					state.prev_pile_is_opcode_table = False
+					state.next_pile_is_opcode_table = False
+
+				if (createNewFile):
+					self.close_file(instruction_prev, markdown)
+					markdown = ''
+					state.prev_pile_is_opcode_table = False
+
+				if (self.stats != None):
+					# the intermediate of a table is cached in the pile, build it first to time it on its own
+					if pile._is_table():
+						with self.stats.measure('tables', pile.page):
+							pile._get_table_intermediate()
+					self._count(pile)
+				with measure(self.stats, 'markdown', pile.page):
+					pile_markdown = pile.gen_markdown(state)
+				if (self.signatures != None) or (self.documents != None) or (self.index != None):
+					self._add_block(pile, state, pile_markdown)
+				markdown += pile_markdown
+
+			self.close_file(instruction_curr, markdown)
+		finally:
+			# also after an error, such that the queued pages and the manifest are written
+			if (self.backend in opened):
+				with measure(self.stats, 'write'):
+					self.backend.close()
+			for sink in opened[1:]:
+				sink.close()
+
+		print('created ' + str(self._counts['created']) + ', updated ' + str(self._counts['updated']) + ', unchanged ' + str(self._counts['unchanged']) + ' files')
@@ -1,33 +1,117 @@
 
 import sys
 import os
+import argparse
 import inteldoc2md
 
-def main(argv):
-	if len(argv) == 2:
-		filename = argv[1]
-		title = os.path.splitext(os.path.basename(filename))[0]
-		print('Parsing', filename)
-	else:
-#		filename = './resources/test/jcc.pdf' # parse instruction ADD
-#		filename = './resources/test/selection__(p14-15).pdf' # parse instruction ADD
-#		filename = './resources/test/selection__(p250-253).pdf' # parse instruction CVTTPD2DQ
-#		filename = './resources/325462-sdm-vol-1-2abcd-3abcd-selection.pdf'
-#		filename = './resources/architecture-instruction-set-extensions-programming-reference-selection.pdf'
-		filename = './resources/selection-ext.pdf'
-		title = os.path.splitext(os.path.basename(filename))[0]
-		print('Parsing', filename)
+#DEFAULT_FILENAME = './resources/test/jcc.pdf' # parse instruction ADD
+#DEFAULT_FILENAME = './resources/test/selection__(p14-15).pdf' # parse instruction ADD
+#DEFAULT_FILENAME = './resources/test/selection__(p250-253).pdf' # parse instruction CVTTPD2DQ
+#DEFAULT_FILENAME = './resources/325462-sdm-vol-1-2abcd-3abcd-selection.pdf'
+#DEFAULT_FILENAME = './resources/architecture-instruction-set-extensions-programming-reference-selection.pdf'
+DEFAULT_FILENAME = './resources/selection-ext.pdf'
 
+def create_backend(backend, output):
+	if backend == 'sqlite':
+		return inteldoc2md.SqliteBackend(os.path.join(output, 'inteldoc2md.sqlite'))
+	elif backend == 'zip':
+		return inteldoc2md.ZipBackend(os.path.join(output, 'inteldoc2md.zip'))
+	else:
+		return inteldoc2md.DirectoryBackend(output)
 
-	parser = inteldoc2md.Parser(filename)
+def parse(filename, stats=None):
+	print('Parsing', filename)
+	parser = inteldoc2md.Parser(filename, stats)
 	parser.extract()
 #	parser.extract(469, 473) # extract a selected range of pages
-	piles = parser.parse()
+	return parser.parse()
+
+def serve(argv):
+	argparser = argparse.ArgumentParser(prog='main.py serve', description='Keep all instruction pages in memory and answer queries over HTTP and JSON-RPC.')
+	argparser.add_argument('filename', nargs='?', default=DEFAULT_FILENAME, help='the pdf to parse')
+	argparser.add_argument('--cache', default='./output/corpus.jsonl', help='the parsed pages are loaded from and saved to this file')
+	argparser.add_argument('--host', default='127.0.0.1')
+	argparser.add_argument('--port', type=int, default=8765)
+	args = argparser.parse_args(argv)
+
+	corpus = inteldoc2md.Corpus()
+	if not corpus.load(args.cache, args.filename):
+		piles = parse(args.filename)
+		writer = inteldoc2md.Writer(corpus, documents=corpus)
+		writer.write(piles)
+		corpus.save(args.cache, args.filename)
+	inteldoc2md.serve(corpus, args.host, args.port)
+
+def watch(argv):
+	argparser = argparse.ArgumentParser(prog='main.py watch', description='Keep the parsed pages in memory and write the md pages again when the pdf or the inteldoc2md modules change.')
+	argparser.add_argument('filename', nargs='?', default=DEFAULT_FILENAME, help='the pdf to parse')
+	argparser.add_argument('--output', default='./output', help='directory to write the output to')
+	argparser.add_argument('--backend', choices=['directory', 'sqlite', 'zip'], default='directory', help='one md file per instruction, or all pages in one SQLite database or zip archive')
+	argparser.add_argument('--interval', type=float, default=1.0, help='seconds between checks for changes')
+	args = argparser.parse_args(argv)
+
+	# the classes are looked up on every call, such that a reloaded Writer is used
+	create_writer = lambda: inteldoc2md.Writer(create_backend(args.backend, args.output))
+	inteldoc2md.Watcher(args.filename, create_writer, args.interval).run()
+
+def run(args, stats):
+	piles = parse(args.filename, stats)
 
-	writer = inteldoc2md.Writer()
+	signatures = inteldoc2md.SignatureWriter(args.signatures) if (args.signatures != None) else None
+	documents = inteldoc2md.DocumentWriter(args.jsonl, args.msgpack) if ((args.jsonl != None) or (args.msgpack != None)) else None
+	index = inteldoc2md.MnemonicIndex(args.index) if (args.index != None) else None
+	writer = inteldoc2md.Writer(create_backend(args.backend, args.output), signatures, documents, index, stats)
 	writer.write(piles)
 
+def main(argv):
+	if (len(argv) > 1) and (argv[1] == 'serve'):
+		serve(argv[2:])
+		return
+	if (len(argv) > 1) and (argv[1] == 'watch'):
+		watch(argv[2:])
+		return
+
+	argparser = argparse.ArgumentParser(prog='main.py', description='Read the Intel documentation and save for every instruction a md page. Run "main.py serve -h" for the documentation server, "main.py watch -h" to write the pages again on every change.')
+	argparser.add_argument('filename', nargs='?', default=DEFAULT_FILENAME, help='the pdf to parse')
+	argparser.add_argument('--output', default='./output', help='directory to write the output to')
+	argparser.add_argument('--signatures', metavar='FILENAME', default=None, help='also write the AsmDude signature file (as MnemonicStore loads it) to FILENAME')
+	argparser.add_argument('--jsonl', metavar='FILENAME', default=None, help='also write a structured document per instruction as JSON Lines to FILENAME')
+	argparser.add_argument('--msgpack', metavar='FILENAME', default=None, help='also write a structured document per instruction as MessagePack to FILENAME')
+	argparser.add_argument('--index', metavar='FILENAME', default=None, help='also write an SQLite index from every mnemonic, alias and instruction form to its page to FILENAME')
+	argparser.add_argument('--backend', choices=['directory', 'sqlite', 'zip'], default='directory', help='one md file per instruction, or all pages in one SQLite database or zip archive')
+	argparser.add_argument('--stats', metavar='FILENAME', default=None, help='measure time and allocations per stage and per page, write them as JSON to FILENAME and print a summary')
+	argparser.add_argument('--stats-top', metavar='N', type=int, default=10, help='the number of slowest pages in the summary')
+	argparser.add_argument('--no-trace-memory', action='store_true', help='do not trace allocations with tracemalloc, which slows the run down')
+	argparser.add_argument('--profile', metavar='FILENAME', default=None, help='profile the run and write the profile to FILENAME')
+	argparser.add_argument('--profile-format', choices=['collapsed', 'pstats'], default='collapsed', help='collapsed stacks for flamegraph tools, or cProfile statistics')
+	argparser.add_argument('--profile-pages', metavar='N', type=int, default=None, help='instead of the whole run, profile the N slowest pages of the run on their own')
+	args = argparser.parse_args(argv[1:])
+
+	# the slowest pages are known from the per page timing of the stats
+	stats = inteldoc2md.Stats(not args.no_trace_memory) if (args.stats != None) else None
+	if (stats == None) and (args.profile != None) and (args.profile_pages != None):
+		stats = inteldoc2md.Stats(False)
+	if (stats != None):
+		stats.start()
+	profiler = inteldoc2md.create_profiler(args.profile_format) if (args.profile != None) else None
+	if (profiler != None) and (args.profile_pages == None):
+		with profiler.profile():
+			run(args, stats)
+	else:
+		run(args, stats)
+
+	if (stats != None):
+		stats.stop()
+	if (args.stats != None):
+		stats.save(args.stats)
+		print(stats.summary(args.stats_top))
+	if (profiler != None):
+		if (args.profile_pages != None):
+			slowest = sorted(stats.pages.keys(), key=lambda page: stats.pages[page]['wall'], reverse=True)[:args.profile_pages]
+			print('profiling pages ' + ', '.join([str(page) for page in slowest]))
+			inteldoc2md.profile_pages(args.filename, slowest, profiler)
+		profiler.save(args.profile)
+
 
 if __name__ == '__main__':
 	main(sys.argv)
-
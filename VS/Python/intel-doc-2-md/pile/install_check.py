@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+
+import os, sys
+import re
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+import subprocess
+import urllib.request
+
+# Installs packages with pile.py from a local http server, and checks what is installed and what the server was
+# asked. pile.py and jsmin.py are copied into a temporary directory with their own recipes, next to a project, a
+# cache and the scripts the server serves, such that nothing is written next to this file:
+#   python pile/install_check.py           check the install
+#   python pile/install_check.py --keep    keep the temporary directory, to look at it
+
+PILE_DIR        = os.path.dirname(os.path.abspath(__file__))
+REQUEST         = re.compile(r'"GET (\S+) HTTP/[\d.]+" (\d+)')
+
+SCRIPTS         = {"base.js": "var base = 1;\n", "app.js": "var app = base + 1;\n"}
+RECIPES         = {
+    "base": '{"name": "base", "version": "1.0", "description": "what app depends on", "url": "%s/base.js"}',
+    "app": '{"name": "app", "version": "1.0", "description": "a package with a dependency", "url": "%s/app.js", "dependencies": ["base"]}',
+    "missing": '{"name": "missing", "version": "1.0", "description": "a script that is not on the server", "url": "%s/missing.js"}',
+}
+
+
+def check(root, url):
+    """ The names of the steps that fail"""
+    project = os.path.join(root, "project")
+    www = os.path.join(root, "www")
+    failures = []
+
+    def step(name, args, code, output, requests, installed):
+        # requests: the status the server answered, by path; installed: the content of the scripts in js/
+        mark = len(_requests(root))
+        result = subprocess.run([sys.executable, os.path.join(root, "pile", "pile.py")] + args, cwd=project,
+            env=dict(os.environ, PILE_CACHE=os.path.join(root, "cache")), stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        text = result.stdout.decode("utf8")
+        problems = []
+        if result.returncode != code:
+            problems.append("exit code %d instead of %d" % (result.returncode, code))
+        problems += ["no %r in the output" % line for line in output if line not in text]
+        asked = _requests(root)[mark:]
+        if sorted(asked) != sorted(requests.items()):
+            problems.append("the server was asked %s instead of %s" % (sorted(asked), sorted(requests.items())))
+        for script, content in installed.items():
+            path = os.path.join(project, "js", script)
+            found = open(path, encoding="utf8").read() if os.path.isfile(path) else None
+            if found != content:
+                problems.append("js/%s is %r instead of %r" % (script, found, content))
+        print("%s: %s" % (name, "; ".join(problems) or "ok"))
+        if problems:
+            print("  " + text.strip().replace("\n", "\n  "))
+            failures.append(name)
+
+    step("install", ["-i", "app"], 0, ["Installed base (1.0)\n", "Installed app (1.0)\n"],
+        {"/base.js": "200", "/app.js": "200"}, SCRIPTS)
+    step("install again", ["-i", "app"], 0, ["Installed base (1.0) from the cache", "Installed app (1.0) from the cache"],
+        {"/base.js": "304", "/app.js": "304"}, SCRIPTS)
+
+    changed = "var app = base + 2;\n"
+    _serve(www, "app.js", changed, time.time() + 10)
+    step("changed on the server", ["-i", "app"], 0, ["Installed base (1.0) from the cache", "Installed app (1.0)\n"],
+        {"/base.js": "304", "/app.js": "200"}, dict(SCRIPTS, **{"app.js": changed}))
+
+    step("not on the server", ["-i", "missing"], 1, ["Could not install missing: 404"],
+        {"/missing.js": "404"}, {"missing.js": None})
+
+    shutil.rmtree(os.path.join(project, "js"))
+    step("frozen, from the cache", ["--frozen"], 0, ["Installed base (1.0) from the cache", "Installed app (1.0) from the cache"],
+        {}, dict(SCRIPTS, **{"app.js": changed}))
+
+    shutil.rmtree(os.path.join(root, "cache", "blobs"))
+    step("frozen, without a cache", ["--frozen"], 0, ["Installed base (1.0)\n", "Installed app (1.0)\n"],
+        {"/base.js": "200", "/app.js": "200"}, dict(SCRIPTS, **{"app.js": changed}))
+    return failures
+
+
+def setup(root):
+    """ The temporary pile, project and scripts in root, and the http server for them; returns the server and its url"""
+    www = os.path.join(root, "www")
+    recipes = os.path.join(root, "pile", "packages")
+    os.makedirs(www)
+    os.makedirs(recipes)
+    os.makedirs(os.path.join(root, "project"))
+    for file in ["pile.py", "jsmin.py"]:
+        shutil.copy(os.path.join(PILE_DIR, file), os.path.join(root, "pile", file))
+    for script, content in SCRIPTS.items():
+        _serve(www, script, content, time.time() - 10)
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    url = "http://127.0.0.1:%d" % port
+    for lib, recipe in RECIPES.items():
+        with open(os.path.join(recipes, lib + ".json"), "w") as target:
+            target.write(recipe % url)
+
+    log = open(os.path.join(root, "server.log"), "w")
+    server = subprocess.Popen([sys.executable, "-u", "-m", "http.server", str(port), "--bind", "127.0.0.1", "--directory", www],
+        stdout=subprocess.DEVNULL, stderr=log)
+    log.close()
+    for attempt in range(100):
+        try:
+            urllib.request.urlopen(url + "/").close()
+            break
+        except OSError:
+            time.sleep(0.1)
+
+    for args in [["-n"], ["-j", "js"]]:
+        subprocess.run([sys.executable, os.path.join(root, "pile", "pile.py")] + args, cwd=os.path.join(root, "project"),
+            env=dict(os.environ, PILE_CACHE=os.path.join(root, "cache")), stdout=subprocess.DEVNULL, check=True)
+    return server, url
+
+
+def _serve(www, script, content, mtime):
+    # http.server answers If-Modified-Since by the mtime, in seconds
+    path = os.path.join(www, script)
+    with open(path, "w", encoding="utf8") as target:
+        target.write(content)
+    os.utime(path, (mtime, mtime))
+
+
+def _requests(root):
+    # (path, status) of every request the server logged, but the one that waited for it to start
+    with open(os.path.join(root, "server.log")) as log:
+        return [match.groups() for match in REQUEST.finditer(log.read()) if match.group(1) != "/"]
+
+
+def main(argv):
+    argparser = argparse.ArgumentParser(prog="install_check.py", description="Check pile -i and --frozen against a local http server.")
+    argparser.add_argument("--keep", action="store_true", help="keep the temporary directory")
+    args = argparser.parse_args(argv[1:])
+
+    root = tempfile.mkdtemp(prefix="pile_check_")
+    server = None
+    try:
+        server, url = setup(root)
+        failures = check(root, url)
+    finally:
+        if server != None:
+            server.terminate()
+            server.wait()
+        if args.keep:
+            print("kept %s" % root)
+        else:
+            shutil.rmtree(root)
+    print("%d failed" % len(failures))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
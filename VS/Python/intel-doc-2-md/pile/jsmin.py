@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+
+import os, sys
+import re
+import tempfile
+
+# bump when the output of minify changes, such that cached results are made again
+VERSION         = 3
+
+KEYWORDS        = set("""break case catch class const continue debugger default delete do else enum export extends
+    false finally for function if implements import in instanceof interface let new null package private protected
+    public return static super switch this throw true try typeof var void while with yield await async of get set
+    arguments eval undefined NaN Infinity""".split())
+
+# after these, a / starts a regular expression instead of a division
+REGEX_AFTER     = set("return typeof instanceof in of new delete void throw case do else".split())
+
+# and after the ) of their conditions
+CONDITIONS      = set("if while for with".split())
+
+# the keywords and tokens that make renaming unsafe for the whole file: block scoping, and syntax that
+# binds names without var or function
+ES6             = set("let const class import export yield async await => ... `".split())
+
+PUNCTUATORS     = re.compile(r">>>=|\.\.\.|===|!==|\*\*=|<<=|>>=|>>>|\?\?=|&&=|\|\|=|=>|==|!=|<=|>=|&&|\|\||\?\?|\?\.(?!\d)|\+\+|--|\+=|-=|\*=|/=|%=|&=|\|=|\^=|<<|>>|\*\*|[{}()\[\];,<>+\-*%&|^!~?:=./@#]")
+IDENTIFIER      = re.compile(r"(?:[A-Za-z_$\u0080-\uffff]|\\u[0-9a-fA-F]{4}|\\u\{[0-9a-fA-F]+\})(?:[\w$\u0080-\uffff]|\\u[0-9a-fA-F]{4}|\\u\{[0-9a-fA-F]+\})*")
+NUMBER          = re.compile(r"(?:0[xX][0-9a-fA-F_]+|0[oO][0-7_]+|0[bB][01_]+|(?:\d[\d_]*\.?[\d_]*|\.\d[\d_]*)(?:[eE][+-]?\d[\d_]*)?)n?")
+WHITESPACE      = re.compile(r"[ \t\f\v\u00a0\ufeff\u2000-\u200a\u202f\u205f\u3000]+")
+NEWLINES        = "\n\r\u2028\u2029"
+
+# a newline between two tokens is kept when the first can end a statement and the second can start one,
+# such that automatic semicolon insertion sees the same line breaks as in the source
+ENDS            = set(") ] } ++ --".split())
+STARTS          = set("{ [ ( + - ! ~ ++ --".split())
+
+
+class Token(object):
+    def __init__(self, kind, text, newline):
+        self.kind = kind        # ident, num, str, template, regex, punct, comment
+        self.text = text
+        self.newline = newline  # a line break between this token and the one before
+        self.condition = False  # a ) that closes the condition of if, while, for or with
+
+
+def tokenize(source):
+    """ The tokens of source; comments are dropped except /*! ... */, which are kept as license comments"""
+    tokens = []
+    pos = 0
+    end = len(source)
+    newline = False
+    previous = None
+    parens = []         # the identifier before every open (
+
+    if source.startswith("#!"):
+        pos = source.find("\n") if ("\n" in source) else end
+        tokens.append(Token("comment", source[:pos], False))
+
+    while pos < end:
+        char = source[pos]
+
+        match = WHITESPACE.match(source, pos)
+        if match:
+            pos = match.end()
+            continue
+        if char in NEWLINES:
+            newline = True
+            pos += 1
+            continue
+
+        if source.startswith("//", pos) or source.startswith("<!--", pos) or \
+                (source.startswith("-->", pos) and (newline or (previous == None))):
+            # and the html-like comments of scripts, <!-- anywhere and --> at the start of a line
+            while (pos < end) and (source[pos] not in NEWLINES):
+                pos += 1
+            continue
+        if source.startswith("/*", pos):
+            close = source.find("*/", pos + 2)
+            if close < 0:
+                raise SyntaxError("unterminated comment")
+            comment = source[pos:close + 2]
+            if any(char in comment for char in NEWLINES):
+                newline = True
+            if comment.startswith("/*!"):
+                tokens.append(Token("comment", comment, newline))
+                newline = False
+            pos = close + 2
+            continue
+
+        if char in "'\"":
+            token = Token("str", source[pos:_skip_string(source, pos, char)], newline)
+        elif char == "`":
+            token = Token("template", source[pos:_skip_template(source, pos)], newline)
+        elif (char == "/") and _regex_allowed(previous):
+            token = Token("regex", source[pos:_skip_regex(source, pos)], newline)
+        elif char.isdigit() or ((char == ".") and source[pos + 1:pos + 2].isdigit()):
+            token = Token("num", NUMBER.match(source, pos).group(), newline)
+        else:
+            match = IDENTIFIER.match(source, pos + 1 if (char == "#") else pos)
+            if match:
+                # #name is a private class field
+                token = Token("ident", source[pos:match.end()], newline)
+            else:
+                match = PUNCTUATORS.match(source, pos)
+                if not match:
+                    raise SyntaxError("unexpected character %r at %d" % (char, pos))
+                token = Token("punct", match.group(), newline)
+
+        if token.text == "(":
+            parens.append(previous.text if (previous != None) and (previous.kind == "ident") else None)
+        elif (token.text == ")") and parens:
+            token.condition = (parens.pop() in CONDITIONS)
+
+        pos += len(token.text)
+        tokens.append(token)
+        previous = token
+        newline = False
+    return tokens
+
+
+def _skip_string(source, pos, quote):
+    pos += 1
+    while pos < len(source):
+        char = source[pos]
+        if char == "\\":
+            pos += 3 if source.startswith("\r\n", pos + 1) else 2
+            continue
+        if char == quote:
+            return pos + 1
+        if char in "\n\r":
+            break
+        pos += 1
+    raise SyntaxError("unterminated string")
+
+
+def _skip_template(source, pos):
+    # the expressions in ${...} are skipped by counting braces, and the strings and templates in them
+    pos += 1
+    while pos < len(source):
+        char = source[pos]
+        if char == "\\":
+            pos += 2
+            continue
+        if char == "`":
+            return pos + 1
+        if source.startswith("${", pos):
+            depth = 1
+            pos += 2
+            while (pos < len(source)) and depth:
+                char = source[pos]
+                if char in "'\"":
+                    pos = _skip_string(source, pos, char)
+                    continue
+                if char == "`":
+                    pos = _skip_template(source, pos)
+                    continue
+                if char == "{":
+                    depth += 1
+                elif char == "}":
+                    depth -= 1
+                pos += 1
+            continue
+        pos += 1
+    raise SyntaxError("unterminated template")
+
+
+def _skip_regex(source, pos):
+    pos += 1
+    in_class = False
+    while pos < len(source):
+        char = source[pos]
+        if char == "\\":
+            pos += 2
+            continue
+        if char in "\n\r":
+            break
+        if char == "[":
+            in_class = True
+        elif char == "]":
+            in_class = False
+        elif (char == "/") and not in_class:
+            pos += 1
+            while (pos < len(source)) and (source[pos].isalnum() or (source[pos] in "_$")):
+                pos += 1
+            return pos
+        pos += 1
+    raise SyntaxError("unterminated regular expression")
+
+
+def _regex_allowed(previous):
+    if previous == None:
+        return True
+    if previous.kind == "ident":
+        return previous.text in REGEX_AFTER
+    if previous.kind == "punct":
+        return (previous.text not in [")", "]"]) or previous.condition
+    return False
+
+
+class Scope(object):
+    def __init__(self, parent):
+        self.parent = parent
+        self.children = []
+        self.bindings = {}      # name -> Binding
+        self.refs = []          # (token index, name) of the identifiers in this scope
+        self.safe = True        # no eval or with in this scope or below it
+        if parent:
+            parent.children.append(self)
+
+
+class Binding(object):
+    def __init__(self, name, fixed=False):
+        self.name = name
+        self.fixed = fixed      # keeps its name
+        self.tokens = []
+        self.final = name
+
+
+def rename(tokens):
+    """ Shorten the names of the parameters, vars and functions that are local to a function; globals, properties
+    and the locals of functions that use eval or with keep their names. Returns False when the file uses syntax
+    that this does not understand, and nothing was renamed."""
+    code = [idx for idx, token in enumerate(tokens) if token.kind != "comment"]
+    brackets = []
+    for position, idx in enumerate(code):
+        token = tokens[idx]
+        if (token.text in ES6) or (token.kind == "template") or ((token.kind == "ident") and ("\\" in token.text)):
+            return False
+        if token.kind == "punct":
+            if token.text in ["(", "[", "{"]:
+                brackets.append(token.text)
+            elif (token.text in [")", "]", "}"]) and brackets:
+                brackets.pop()
+        # shorthand properties, {a, b}, and destructuring, var {a} = ... and var [a] = ...
+        if (token.kind == "ident") and (token.text not in KEYWORDS) and brackets and (brackets[-1] == "{") and \
+                (0 < position < len(code) - 1) and (tokens[code[position - 1]].text in ["{", ","]) and \
+                (tokens[code[position + 1]].text in ["}", ","]):
+            return False
+        if (token.text == "var") and (position < len(code) - 1) and (tokens[code[position + 1]].text in ["{", "["]):
+            return False
+
+    root = Scope(None)
+    scope = root
+    functions = []      # (scope, bracket depth of its body)
+    pending = None      # the scope of a function whose parameters and body are still to come
+    pending_depth = 0
+    variables = []      # [scope, bracket depth, expecting a name] of the var statements being read
+    depth = 0
+
+    for position, idx in enumerate(code):
+        token = tokens[idx]
+        text = token.text
+        previous = tokens[code[position - 1]] if position else None
+        following = tokens[code[position + 1]] if (position + 1 < len(code)) else None
+
+        if token.kind == "punct":
+            if (pending != None) and (depth == pending_depth + 1) and (text in ["=", "[", "{", "..."]):
+                # default values and destructuring in the parameters
+                return False
+            if text in ["(", "[", "{"]:
+                depth += 1
+                if (text == "{") and (pending != None) and (depth == pending_depth + 1):
+                    functions.append((pending, depth))
+                    scope = pending
+                    pending = None
+            elif text in [")", "]", "}"]:
+                if functions and (text == "}") and (functions[-1][1] == depth):
+                    functions.pop()
+                    scope = functions[-1][0] if functions else root
+                depth -= 1
+            if variables and (depth == variables[-1][1]) and (text == ","):
+                variables[-1][2] = True
+            elif variables and ((depth < variables[-1][1]) or ((depth == variables[-1][1]) and (text == ";"))):
+                variables.pop()
+            continue
+
+        if token.kind != "ident":
+            continue
+
+        if variables and (depth == variables[-1][1]) and not variables[-1][2]:
+            if (text in ["in", "of"]) or (token.newline and (text not in ["in", "instanceof"]) and
+                    ((previous.kind != "punct") or (previous.text in ENDS))):
+                # the end of for (var name in ...), or a line break that ended the var statement
+                variables.pop()
+
+        member = (previous != None) and (previous.text in [".", "?."])
+        if (text == "function") and not member:
+            name = following if (following and (following.kind == "ident")) else None
+            pending = Scope(scope)
+            pending_depth = depth
+            if name != None:
+                # a declaration binds its name in the enclosing scope; the name of a function expression is only
+                # bound inside it, and keeps its name in case the guess is wrong
+                declaration = (previous == None) or (previous.text in [";", "{", "}"]) or \
+                    (token.newline and ((previous.kind != "punct") or (previous.text in ENDS)))
+                ambiguous = (not declaration) and (previous.text in [")", ":", "else", "do"])
+                target = scope if (declaration or ambiguous) else pending
+                _declare(target, name.text, code[position + 1], (not declaration) or (target == root))
+            continue
+
+        if (text == "var") and not member:
+            variables.append([scope, depth, True])
+            continue
+
+        if (text in ["eval", "with"]) and not member:
+            walk = scope
+            while walk:
+                walk.safe = False
+                walk = walk.parent
+            if pending:
+                pending.safe = False
+
+        if (previous != None) and (previous.text == "function"):
+            # its name, declared above
+            continue
+
+        if variables and variables[-1][2] and (depth == variables[-1][1]):
+            variables[-1][2] = False
+            _declare(variables[-1][0], text, idx, variables[-1][0] == root)
+            continue
+
+        if (pending != None) and (depth == pending_depth + 1) and (previous.text in ["(", ","]):
+            # a parameter of the function whose body comes next
+            _declare(pending, text, idx, False)
+            continue
+
+        if (text in KEYWORDS) or _is_property(token, previous, following):
+            continue
+        scope.refs.append((idx, text))
+
+    _resolve(root)
+    _assign(root, set(token.text for token in tokens if token.kind == "ident"))
+    for binding in _all_bindings(root):
+        for idx in binding.tokens:
+            tokens[idx].text = binding.final
+    return True
+
+
+def _is_property(token, previous, following):
+    # a.name, {name: value}, get name() {}, and the labels in name: and break name
+    if previous == None:
+        return (following != None) and (following.text == ":")
+    if previous.text in [".", "?."]:
+        return True
+    if following and (following.text == ":") and (previous.text not in ["?", "case"]):
+        return (previous.text in ["{", ",", ";", "}", ")", "else", "do"]) or token.newline
+    if (previous.text in ["get", "set"]) and following and (following.text == "("):
+        return True
+    if (previous.text in ["break", "continue"]) and not token.newline:
+        return True
+    return False
+
+
+def _declare(scope, name, idx, fixed):
+    binding = scope.bindings.get(name)
+    if binding == None:
+        binding = Binding(name, fixed)
+        scope.bindings[name] = binding
+    binding.fixed = binding.fixed or fixed or (name in KEYWORDS)
+    binding.tokens.append(idx)
+
+
+def _resolve(root):
+    # every identifier belongs to the nearest binding of its name; the bindings that are used from a scope below
+    # the one that declares them are remembered on the way up, as they must keep their name there
+    stack = [root]
+    while stack:
+        scope = stack.pop()
+        scope.outer = set()
+        stack.extend(scope.children)
+
+    stack = [root]
+    while stack:
+        scope = stack.pop()
+        stack.extend(scope.children)
+        for idx, name in scope.refs:
+            walk = scope
+            while walk and (name not in walk.bindings):
+                walk = walk.parent
+            if walk == None:
+                continue
+            binding = walk.bindings[name]
+            binding.tokens.append(idx)
+            inner = scope
+            while inner != walk:
+                inner.outer.add(binding)
+                inner = inner.parent
+
+
+def _assign(root, used):
+    # from the outside in: a scope gives its bindings the shortest names that are not used anywhere in the file,
+    # and not the name of a binding of an outer scope that is used inside it
+    stack = [root]
+    while stack:
+        scope = stack.pop()
+        stack.extend(scope.children)
+        if (scope == root) or not scope.safe:
+            continue
+        taken = set(binding.final for binding in scope.outer)
+        bindings = sorted(scope.bindings.values(), key=lambda binding: (-len(binding.tokens), binding.name))
+        names = _names()
+        for binding in bindings:
+            if binding.fixed:
+                continue
+            name = next(names)
+            while (name in used) or (name in taken) or (name in KEYWORDS):
+                name = next(names)
+            binding.final = name
+            taken.add(name)
+
+
+def _names():
+    first = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_$"
+    rest = first + "0123456789"
+    for char in first:
+        yield char
+    length = 1
+    while True:
+        for prefix in _combinations(first, rest, length):
+            for char in rest:
+                yield prefix + char
+        length += 1
+
+
+def _combinations(first, rest, length):
+    if length == 1:
+        for char in first:
+            yield char
+        return
+    for prefix in _combinations(first, rest, length - 1):
+        for char in rest:
+            yield prefix + char
+
+
+def _all_bindings(root):
+    stack = [root]
+    while stack:
+        scope = stack.pop()
+        stack.extend(scope.children)
+        if scope.safe and (scope != root):
+            for binding in scope.bindings.values():
+                yield binding
+
+
+def join(tokens):
+    """ The tokens written back with as little whitespace as keeps their meaning"""
+    parts = []
+    previous = None
+    for token in tokens:
+        text = token.text
+        if previous != None:
+            if token.kind == "comment" or previous.kind == "comment":
+                parts.append("\n")
+            elif token.newline and ((previous.kind != "punct") or (previous.text in ENDS)) and \
+                    ((token.kind != "punct") or (token.text in STARTS)):
+                parts.append("\n")
+            elif _word_end(previous.text) and _word_start(text):
+                parts.append(" ")
+            elif (previous.kind == "regex") and _word_start(text):
+                parts.append(" ")
+            elif (previous.text[-1] in "+-") and (text[0] == previous.text[-1]):
+                parts.append(" ")
+            elif (previous.text[-1] == "/") and (text[0] in "/*"):
+                parts.append(" ")
+            elif (previous.kind == "num") and (text[0] == ".") and re.match(r"^\d+$", previous.text):
+                parts.append(" ")
+            elif (previous.text == "<") and text.startswith("!--"):
+                parts.append(" ")
+        parts.append(text)
+        previous = token
+    return "".join(parts)
+
+
+def _word_end(text):
+    char = text[-1]
+    return char.isalnum() or (char in "_$\\") or (ord(char) > 127)
+
+
+def _word_start(text):
+    char = text[0]
+    return char.isalnum() or (char in "_$\\#") or (ord(char) > 127)
+
+
+def minify(source, shorten=True):
+    tokens = tokenize(source)
+    if shorten:
+        rename(tokens)
+    return join(tokens)
+
+
+def minify_file(source_path, target_path):
+    """ Minify source_path into target_path, through a temporary file that is renamed; for the process pool"""
+    source = open(source_path, encoding="utf8").read()
+    try:
+        result = minify(source)
+    except SyntaxError as e:
+        # what the tokenizer does not understand is passed on as it is
+        print("Not minifying %s: %s" % (os.path.basename(source_path), e))
+        result = source
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target_path))
+    with os.fdopen(fd, "w", encoding="utf8") as target:
+        target.write(result)
+    os.replace(tmp_path, target_path)
+    return target_path
+
+
+if __name__ == "__main__":
+    sys.stdout.write(minify(open(sys.argv[1], encoding="utf8").read()))
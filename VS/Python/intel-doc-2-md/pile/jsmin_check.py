@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+import os, sys
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+import jsmin
+
+# Minifies small javascript programs with jsmin.py and checks that the output is the expected output. With node on
+# the path, both the program and its minified output are run, and must print the same:
+#   python pile/jsmin_check.py              check the cases
+#   python pile/jsmin_check.py --no-node    check the output only
+
+CASES = [
+    # a / after the condition of an if, or after a block, starts a regular expression; after a call, a division
+    ("regex after the condition of an if",
+        "function test(text) {\n\tif (text) /a  +b/.test(text) && console.log(\"match \" + text);\n\treturn (text.length + 1) / 2 / 1;\n}\nconsole.log(test(\"a  b\"), test(\"ab\"));\n",
+        "function test(a){if(a)/a  +b/.test(a)&&console.log(\"match \"+a);return(a.length+1)/2/1;}\nconsole.log(test(\"a  b\"),test(\"ab\"));"),
+    ("regex after a block",
+        "function test(text) {\n\tif (!text) { return 0 }\n\t/x/g.test(text) && console.log(\"x in \" + text)\n\treturn text.split(/,/).length\n}\nconsole.log(test(\"x,y\"), test(\"\"));\n",
+        "function test(a){if(!a){return 0}\n/x/g.test(a)&&console.log(\"x in \"+a)\nreturn a.split(/,/).length}\nconsole.log(test(\"x,y\"),test(\"\"));"),
+    ("division after a call and an index",
+        "var values = [8, 4];\nfunction half(value) { return value / 2 }\nconsole.log(half(values[0]) / values[1] / 1, values [1] /2/ 1);\n",
+        "var values=[8,4];function half(a){return a/2}\nconsole.log(half(values[0])/values[1]/1,values[1]/2/1);"),
+
+    # automatic semicolon insertion: the line breaks that end a statement are kept
+    ("line breaks before ++, (, and after return",
+        "var a = 1, b = 2\nvar c = a\n++b\nfunction f() {\n\treturn\n\t\t42\n}\nvar d = c\n;(function () { console.log(a, b, c, d, f()) })()\n",
+        "var a=1,b=2\nvar c=a\n++b\nfunction f(){return\n42}\nvar d=c;(function(){console.log(a,b,c,d,f())})()"),
+    ("operators that must stay apart",
+        "var a = 1, b = 2;\nconsole.log(a - -b, a + +b, a++ + b, a - --b, 1 .toFixed(1), 3 / /2/.source.length);\n",
+        "var a=1,b=2;console.log(a- -b,a+ +b,a++ +b,a- --b,1 .toFixed(1),3/ /2/.source.length);"),
+
+    # renaming: the locals of a function get short names, globals and properties keep theirs
+    ("locals are renamed",
+        "function total(first, second) {\n\tvar sum = first + second, object = {sum: sum};\n\treturn object.sum;\n}\nconsole.log(total(1, 2));\n",
+        "function total(a,c){var d=a+c,b={sum:d};return b.sum;}\nconsole.log(total(1,2));"),
+    ("eval keeps the names of its function and the functions around it",
+        "function outer(value) {\n\tfunction inner(other) { return eval(\"value + other\") }\n\treturn inner(1);\n}\nconsole.log(outer(2));\n",
+        "function outer(value){function inner(other){return eval(\"value + other\")}\nreturn inner(1);}\nconsole.log(outer(2));"),
+    ("with keeps the names of its function",
+        "function read(object, fallback) {\n\twith (object) { return value || fallback }\n}\nconsole.log(read({value: 3}, 4), read({value: 0}, 4));\n",
+        "function read(object,fallback){with(object){return value||fallback}}\nconsole.log(read({value:3},4),read({value:0},4));"),
+    ("a function expression keeps its name",
+        "var f = function named(count) { return count ? named(count - 1) + 1 : 0 };\nconsole.log(f(3));\n",
+        "var f=function named(a){return a?named(a-1)+1:0};console.log(f(3));"),
+
+    # syntax that binds names without var or function: nothing in the file is renamed
+    ("let",
+        "function scoped(value) {\n\tlet doubled = value * 2;\n\treturn doubled;\n}\nconsole.log(scoped(2));\n",
+        "function scoped(value){let doubled=value*2;return doubled;}\nconsole.log(scoped(2));"),
+    ("destructuring",
+        "function pair(object) {\n\tvar {first, second} = object;\n\treturn first + second;\n}\nconsole.log(pair({first: 1, second: 2}));\n",
+        "function pair(object){var{first,second}=object;return first+second;}\nconsole.log(pair({first:1,second:2}));"),
+    ("shorthand properties",
+        "function wrap(value) {\n\treturn {value};\n}\nconsole.log(wrap(5).value);\n",
+        "function wrap(value){return{value};}\nconsole.log(wrap(5).value);"),
+
+    # comments: /*! ... */ is kept as a license comment, the others are dropped, also <!-- and --> at the start of a line
+    ("comments",
+        "/*! license */\n// a line comment\nvar a = 1 /* a block comment */ + 2; // \"not a string\nconsole.log(a, \"/* not a comment */\", '// nor this');\n",
+        "/*! license */\nvar a=1+2;console.log(a,\"/* not a comment */\",'// nor this');"),
+    ("html-like comments",
+        "var a = 1; <!-- the rest of the line is a comment\nvar b = a <!--b\n--> so is this line\n/* x */ --> and this one\nconsole.log(a, b, a-->0, a);\n",
+        "var a=1;var b=a\nconsole.log(a,b,a-->0,a);"),
+]
+
+
+def check(use_node):
+    """ The names of the cases that fail"""
+    node = shutil.which("node") if use_node else None
+    failures = []
+    for name, source, expected in CASES:
+        result = jsmin.minify(source)
+        if result != expected:
+            print("differs: %s" % name)
+            print("  expected: %r" % expected)
+            print("  minified: %r" % result)
+            failures.append(name)
+            continue
+        if (node != None) and (_run(node, source) != _run(node, result)):
+            print("prints something else: %s" % name)
+            print("  source:   %r" % _run(node, source))
+            print("  minified: %r" % _run(node, result))
+            failures.append(name)
+    if node == None:
+        print("not running the cases, node is not on the path" if use_node else "not running the cases")
+    return failures
+
+
+def _run(node, source):
+    fd, filename = tempfile.mkstemp(suffix=".js")
+    try:
+        with os.fdopen(fd, "w", encoding="utf8") as target:
+            target.write(source)
+        result = subprocess.run([node, filename], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        return result.stdout.decode("utf8")
+    finally:
+        os.remove(filename)
+
+
+def main(argv):
+    argparser = argparse.ArgumentParser(prog="jsmin_check.py", description="Check the output of the javascript minifier of pile on small programs.")
+    argparser.add_argument("--no-node", action="store_true", help="do not run the programs and their minified output with node")
+    args = argparser.parse_args(argv[1:])
+    
+    failures = check(not args.no_node)
+    print("%d passed, %d failed" % (len(CASES) - len(failures), len(failures)))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
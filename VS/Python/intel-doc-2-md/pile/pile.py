@@ -1,9 +1,24 @@
-#!/usr/bin/env python
+#!/usr/bin/env python3
 
 import os, sys
+import re
+import bisect
 import fnmatch
+import shutil
+import hashlib
+import tarfile
+import tempfile
 import argparse
+import collections
 import requests, json
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# run as a script, or imported as pile.pile
+if __package__:
+    from . import jsmin
+else:
+    import jsmin
 
 from pprint import pprint as pp
 
@@ -11,22 +26,77 @@ PILE_MAIN_DIR   = os.path.abspath(os.path.dirname(__file__))
 ROOT_DIR        = os.path.abspath(os.getcwd())
 PILE_CONF_DIR   = "%s/.pile" % ROOT_DIR
 PKG_DIR         = "packages"
+CONCURRENCY     = 8
+INDEX_FILE      = "search_index.json"
+INDEX_VERSION   = 2
+TOKEN           = re.compile(r"[a-z0-9]+")
+CACHE_DIR       = os.environ.get("PILE_CACHE", os.path.expanduser("~/.cache/pile"))
+CHUNK_SIZE      = 64 * 1024
+BUNDLE          = "bundle.js"
+BUILD_FILE      = "build.json"
+LOCK_FILE       = "pile.lock"
 
 class Pile(object):
     def __init__(self): 
         self.config_file_path = "%s/config.json" % PILE_CONF_DIR
+        self.config = None
+        self.__changed = False
+        self.__transactions = 0
     
     def __load_config(self):
+        # read once; the commands of one run share it
+        if self.config != None:
+            return
         try:
             self.config = json.load(open(self.config_file_path))
-        except IOError, e:
-            print
-            print "Please make sure to run pile -n (pile --new) before installing packages"
+        except IOError as e:
+            print()
+            print("Please make sure to run pile -n (pile --new) before installing packages")
             
             sys.exit(-1)
             
     def __write_config(self):
-        json.dump(self.config, open(self.config_file_path, "w+"))
+        # inside a transaction, the config is written once at its end
+        self.__changed = True
+        if not self.__transactions:
+            self.__save_config()
+    
+    def __save_config(self):
+        if self.__changed:
+            self.__write_json(self.config_file_path, self.config)
+            self.__changed = False
+    
+    @contextmanager
+    def transaction(self):
+        """ Batch the changes to the config, which is written once when the outermost transaction ends"""
+        self.__transactions += 1
+        try:
+            yield self
+        finally:
+            self.__transactions -= 1
+            if not self.__transactions:
+                self.__save_config()
+    
+    def __write_json(self, path, data, **kwargs):
+        with self.__atomic(path) as target:
+            json.dump(data, target, **kwargs)
+            if kwargs.get("indent"):
+                target.write("\n")
+    
+    @contextmanager
+    def __atomic(self, path, mode="w", directory=None):
+        """ Write path through a temporary file, renamed over it when the block ends without an error"""
+        # path can be a function, for a name that is only known once the file is written
+        fd, tmp_path = self.__temporary(directory or os.path.dirname(path))
+        try:
+            with os.fdopen(fd, mode) as target:
+                yield target
+                target.flush()
+                os.fsync(target.fileno())
+            os.replace(tmp_path, path() if callable(path) else path)
+        except:
+            os.remove(tmp_path)
+            raise
     
     def new(self):
         """ Setup environment for Pile"""
@@ -35,75 +105,574 @@ class Pile(object):
 
         try:
             self.config = json.load(open(self.config_file_path))
-        except IOError, e:
-            conf = open(self.config_file_path, "w+")
+        except IOError as e:
             self.config = {}
             self.js_dir()
         
             
     def js_dir(self, directory="js"):
+        self.__load_config()
         self.config['dir'] = directory
         self.__write_config()
         
-    def update(self, val=None):
-        print
-        print "Updating pile..."
+    def update(self, archive=None):
+        """ Refresh the recipes with git pull, or from archive, a tar of them: a file or an http(s) url"""
+        print()
+        print("Updating pile...")
+        if archive:
+            self.__sync_recipes(archive)
+            print("Update complete")
+            return
         os.chdir(PILE_MAIN_DIR)
         
-        print "Pulling new packages..."
+        print("Pulling new packages...")
         os.popen("git pull")
-        print "Update complete"
+        print("Update complete")
+        
+    def __sync_recipes(self, archive):
+        """ Make the recipes those of archive, writing only those that changed"""
+        recipe_path = "%s/%s" % (PILE_MAIN_DIR, PKG_DIR)
+        
+        if re.match(r"https?://", archive):
+            archive_path = self.__fetch_archive(archive)
+        else:
+            archive_path = archive
+        
+        # every recipe is read and parsed before one is written, such that a broken archive changes nothing
+        recipes = {}
+        with tarfile.open(archive_path, "r:*") as tar:
+            for member in tar:
+                name = os.path.basename(member.name)
+                if (not member.isfile()) or (not name.endswith(".json")) or name.startswith("."):
+                    continue
+                data = tar.extractfile(member).read()
+                try:
+                    json.loads(data.decode("utf-8"))
+                except ValueError as e:
+                    raise Exception("%s in %s is not a recipe: %s" % (member.name, archive, e))
+                recipes[name] = (data, int(member.mtime * 1000000000))
+        if not recipes:
+            raise Exception("there are no recipes in %s" % archive)
+        
+        if not os.path.isdir(recipe_path):
+            os.makedirs(recipe_path)
+        stamps = self.__recipe_stamps()
+        
+        added, changed, unchanged = [], [], []
+        for name, (data, mtime_ns) in sorted(recipes.items()):
+            path = "%s/%s" % (recipe_path, name)
+            if stamps.get(name) == "%d:%d" % (mtime_ns, len(data)):
+                unchanged.append(name)
+                continue
+            if name in stamps:
+                with open(path, "rb") as recipe:
+                    same = (recipe.read() == data)
+            else:
+                same = False
+            if not same:
+                with self.__atomic(path, "wb") as recipe:
+                    recipe.write(data)
+            # the mtime of the archive, such that the next sync sees it unchanged
+            os.utime(path, ns=(mtime_ns, mtime_ns))
+            (unchanged if same else (changed if (name in stamps) else added)).append(name)
+        
+        removed = sorted(set(stamps.keys()) - set(recipes.keys()))
+        for name in removed:
+            os.remove("%s/%s" % (recipe_path, name))
+        
+        print("Synced %d recipes from %s: %d added, %d changed, %d removed" % (len(recipes), archive, len(added), len(changed), len(removed)))
+        if os.path.isdir(PILE_CONF_DIR):
+            self.__load_index()
+        
+    def __fetch_archive(self, url):
+        """ Download the recipe archive into the cache, unless it did not change; returns its path"""
+        entry = self.__load_cache().get(url)
+        if entry and not os.path.isfile(self.__blob_path(entry["sha256"])):
+            entry = None
+        
+        with requests.Session() as session:
+            result = self.__get(session, url, entry)
+            try:
+                if result.status_code != 304:
+                    result.raise_for_status()
+                    entry = {"sha256": self.__write_blob(result), "etag": result.headers.get("ETag"), "last_modified": result.headers.get("Last-Modified")}
+                    self.__write_cache({url: entry})
+            finally:
+                result.close()
+        return self.__blob_path(entry["sha256"])
         
     def search(self, name):
         self.__load_config()
         
+        print()
+        print("Searching for %s..." % name)
+
+        index = self.__load_index()
+        for idx in self.__query(index, name):
+            package = index["packages"][idx]
+            print("%s (%s): %s" % (package[0], package[1], package[2]))
+                
+        print()
+        
+    def __load_index(self):
+        """ The name, version, description and words of every recipe, kept in .pile"""
         recipe_path     = "%s/%s" % (PILE_MAIN_DIR, PKG_DIR)
+        index_path      = "%s/%s" % (PILE_CONF_DIR, INDEX_FILE)
         
-        print
-        print "Searching for %s..." % name
-
-        for file in os.listdir(recipe_path):
-            if fnmatch.fnmatch(file, "*%s*.json" % name):
+        try:
+            index = json.load(open(index_path))
+        except (IOError, ValueError) as e:
+            index = {}
+        
+        # a recipe that is added, removed or edited in place changes the stamps; one scan of the directory
+        stamps = self.__recipe_stamps()
+        files = sorted(stamps.keys())
+        if (index.get("version") == INDEX_VERSION) and (index.get("files") == files) and (index.get("stamps") == [stamps[file] for file in files]):
+            return index
+        
+        # only the recipes whose mtime or size changed are read again; they are numbered in file name order
+        previous = dict(zip(index.get("files", []), zip(index.get("stamps", []), index.get("packages", []))))
+        packages = []
+        for file in files:
+            if (file in previous) and (previous[file][0] == stamps[file]):
+                packages.append(previous[file][1])
+            else:
                 package = json.load(open(recipe_path + "/" + file))
-                print "%s (%s): %s" % (package['name'], package['version'], package['description'])
-                
-        print
+                packages.append([package.get('name'), package.get('version'), package.get('description')])
         
-    def install(self, lib):
+        tokens = {}
+        for idx, package in enumerate(packages):
+            for token in set(TOKEN.findall(("%s %s" % (package[0], package[2])).lower())):
+                tokens.setdefault(token, []).append(idx)
+        
+        # the numbers as strings, which are much faster to load; only those of the matching words are split
+        tokens = sorted(tokens.items())
+        names = sorted([(package[0] or "").lower(), idx] for idx, package in enumerate(packages))
+        index = {"version": INDEX_VERSION, "files": files, "stamps": [stamps[file] for file in files], "packages": packages,
+            "keys": [token for token, ids in tokens], "ids": [" ".join(map(str, ids)) for token, ids in tokens],
+            "names": [name for name, idx in names], "name_ids": [idx for name, idx in names]}
+        
+        self.__write_json(index_path, index, separators=(",", ":"))
+        return index
+        
+    def __query(self, index, name):
+        """ The numbers of the recipes that match name, best first: by name, by file name, then by words"""
+        scores = {}
+        
+        # the recipes with a word starting with every word of name
+        keys = index["keys"]
+        found = None
+        for word in TOKEN.findall(name.lower()):
+            ids = set()
+            idx = bisect.bisect_left(keys, word)
+            while (idx < len(keys)) and keys[idx].startswith(word):
+                ids.update(map(int, index["ids"][idx].split()))
+                idx += 1
+            found = ids if (found == None) else (found & ids)
+        for idx in (found or []):
+            scores[idx] = 1
+        
+        # the recipes whose file name matches *name*.json; without wildcards, a substring test does
+        if re.search(r"[*?\[]", name):
+            pattern = re.compile(fnmatch.translate("*%s*.json" % name))
+            matches = [idx for idx, file in enumerate(index["files"]) if pattern.match(file)]
+        else:
+            matches = [idx for idx, file in enumerate(index["files"]) if name in file[:-5]]
+        for idx in matches:
+            scores[idx] = 2
+        
+        names = index["names"]
+        idx = bisect.bisect_left(names, name.lower())
+        while (idx < len(names)) and (names[idx] == name.lower()):
+            scores[index["name_ids"][idx]] = 3
+            idx += 1
+        
+        return sorted(scores.keys(), key=lambda idx: (-scores[idx], index["files"][idx]))
+        
+    def __recipe_stamps(self):
+        """ The "mtime_ns:size" of every recipe, by file name"""
+        stamps = {}
+        for entry in os.scandir("%s/%s" % (PILE_MAIN_DIR, PKG_DIR)):
+            if entry.name.endswith(".json"):
+                stat = entry.stat()
+                stamps[entry.name] = "%d:%d" % (stat.st_mtime_ns, stat.st_size)
+        return stamps
+        
+    def set_concurrency(self, concurrency):
+        self.__load_config()
+        self.config['concurrency'] = int(concurrency)
+        self.__write_config()
+        
+    def install(self, libs, concurrency=None, frozen=False):
+        """ Download libs and their dependencies at once and install them in dependency order; with frozen, as locked"""
         self.__load_config()
         
-        lib_path        = "%s/%s/%s.json" % (PILE_MAIN_DIR, PKG_DIR, lib)
-        cache_path      = "%s/.pile/%s/%s.json" % (ROOT_DIR, PKG_DIR, lib)
+        if isinstance(libs, str):
+            libs = [libs]
+        if not concurrency:
+            concurrency = self.config.get("concurrency", CONCURRENCY)
+        
         install_path    = "%s/%s" % (ROOT_DIR, self.config.get('dir'))
+        cache_dir       = "%s/%s" % (PILE_CONF_DIR, PKG_DIR)
         
         if not os.path.isdir(install_path):
             os.makedirs(install_path)
         
-        if not os.path.isdir(PILE_CONF_DIR):
-            os.makedirs(PILE_CONF_DIR)
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
         
-        package = json.load(open(lib_path))
+        lock = self.__load_lock()
+        if frozen:
+            if not lock:
+                print("There is no %s to install from; install the packages without --frozen first" % LOCK_FILE)
+                return [LOCK_FILE]
+            entries = [entry for name, entry in sorted(lock.items()) if (not libs) or (entry["lib"] in libs) or (name in libs)]
+            missing = set(libs) - set(entry["lib"] for entry in entries) - set(entry["recipe"].get("name") for entry in entries)
+            if missing:
+                print("Not in %s: %s" % (LOCK_FILE, ", ".join(sorted(missing))))
+                return sorted(missing)
+            # with what they depend on, as it was locked
+            locked = dict((entry["lib"], entry) for entry in lock.values())
+            try:
+                resolved = self.__resolve([entry["lib"] for entry in entries], dict((lib, entry["recipe"]) for lib, entry in locked.items()))
+            except Exception as e:
+                print("Could not install from %s: %s" % (LOCK_FILE, e))
+                return [entry["lib"] for entry in entries]
+            entries = [locked[lib] for lib, package in resolved]
+            libs = [entry["lib"] for entry in entries]
+            packages = [entry["recipe"] for entry in entries]
+            # the recipes are pinned to the sha256 of the lockfile; a blob that does not match it is fetched again
+            pinned = [dict(entry["recipe"], sha256=entry["sha256"]) for entry in entries]
+            for entry in entries:
+                blob_path = self.__blob_path(entry["sha256"])
+                if os.path.isfile(blob_path) and (self.__hash_file(blob_path) != entry["sha256"]):
+                    os.remove(blob_path)
+        else:
+            try:
+                resolved = self.__resolve(libs)
+            except Exception as e:
+                print("Could not install %s: %s" % (", ".join(libs), e))
+                return libs
+            if len(resolved) > len(libs):
+                print("Installing %s" % ", ".join(package.get("name") for lib, package in resolved))
+            libs = [lib for lib, package in resolved]
+            packages = [package for lib, package in resolved]
+            pinned = packages
         
-        result = requests.get(package.get("url"))
-        name = package.get("url").split("/")
-        name = name[len(name) - 1]
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        
+        urls = self.__load_cache()
         
-        script = open("%s/%s" % (install_path, name), "w+")
-        script.write(result.content)
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [executor.submit(self.__download, session, package, install_path, urls.get(package.get("url"))) for package in pinned]
+        session.close()
         
+        # the config is only written from here, once all downloads are done
         if not self.config.get("installed_packages"):
             self.config["installed_packages"] = []
+        
+        failed = []
+        for lib, package, future in zip(libs, packages, futures):
+            error = future.exception()
+            if error:
+                print("Could not install %s: %s" % (package.get("name"), error))
+                failed.append(lib)
+                continue
             
-        self.config["installed_packages"].append(package.get("name"))
-            
-        json.dump(package, open(cache_path, "w+"))
+            entry, transferred = future.result()
+            urls[package.get("url")] = entry
+            print("Installed %s (%s)%s" % (package.get("name"), package.get("version"), "" if transferred else " from the cache"))
+            if package.get("name") not in self.config["installed_packages"]:
+                self.config["installed_packages"].append(package.get("name"))
+            self.__write_json("%s/%s.json" % (cache_dir, lib), package)
+            lock[package.get("name")] = {"lib": lib, "version": package.get("version"), "url": package.get("url"),
+                "size": os.path.getsize(self.__blob_path(entry["sha256"])), "sha256": entry["sha256"], "recipe": package}
+        
+        self.__write_cache(urls)
         self.__write_config()
+        if not frozen:
+            self.__write_lock(lock)
+        return failed
         
-    def build(self):
-        pass
+    def __resolve(self, libs, known=None):
+        """ [lib, recipe] of libs and all they depend on, in dependency order; from known, by lib, or read"""
+        recipes = collections.OrderedDict()
+        pending = collections.deque((lib, None) for lib in libs)
+        while pending:
+            lib, dependent = pending.popleft()
+            if lib in recipes:
+                continue
+            recipe_path = "%s/%s/%s.json" % (PILE_MAIN_DIR, PKG_DIR, lib)
+            if known != None:
+                recipe = known.get(lib)
+            elif os.path.isfile(recipe_path):
+                recipe = json.load(open(recipe_path))
+            else:
+                recipe = None
+            if recipe == None:
+                raise Exception(("there is no recipe for %s" % lib) if (dependent == None) else ("%s depends on %s, for which there is no recipe" % (dependent, lib)))
+            recipes[lib] = recipe
+            pending.extend((dependency, lib) for dependency in recipes[lib].get("dependencies", []))
         
-    def compress(self, val=None):
-        pass
+        return [[lib, recipes[lib]] for lib in self.__dependency_order(recipes)]
+        
+    def __load_lock(self):
+        """ The lockfile, by package name: the recipe it was installed from, and the version, url, size and sha256 of its script"""
+        try:
+            return json.load(open("%s/%s" % (ROOT_DIR, LOCK_FILE)))
+        except (IOError, ValueError) as e:
+            return {}
+        
+    def __write_lock(self, lock):
+        # sorted and indented, such that it can be kept under version control and diffed
+        self.__write_json("%s/%s" % (ROOT_DIR, LOCK_FILE), lock, indent=2, sort_keys=True)
+        
+    def __download(self, session, package, install_path, entry):
+        """ Install the script of package, from the cache unless it changed; returns its cache entry, and whether it was transferred"""
+        url = package.get("url")
+        name = url.split("/")
+        name = name[len(name) - 1]
+        
+        if entry and not os.path.isfile(self.__blob_path(entry["sha256"])):
+            entry = None
+        
+        # a recipe that pins the sha256 of its script needs no request at all once the blob is there
+        if package.get("sha256") and os.path.isfile(self.__blob_path(package.get("sha256"))):
+            self.__install_blob(package.get("sha256"), "%s/%s" % (install_path, name))
+            return (entry or {"sha256": package.get("sha256")}), False
+        
+        result = self.__get(session, url, entry)
+        try:
+            transferred = (result.status_code != 304)
+            if transferred:
+                result.raise_for_status()
+                digest = self.__write_blob(result, package.get("sha256"))
+                entry = {"sha256": digest, "etag": result.headers.get("ETag"), "last_modified": result.headers.get("Last-Modified")}
+        finally:
+            result.close()
+        
+        if package.get("sha256") and (package.get("sha256") != entry["sha256"]):
+            raise Exception("sha256 mismatch, %s instead of %s" % (entry["sha256"], package.get("sha256")))
+        self.__install_blob(entry["sha256"], "%s/%s" % (install_path, name))
+        return entry, transferred
+        
+    def __get(self, session, url, entry):
+        """ The response to a GET of url, conditional on its cache entry"""
+        headers = self.__conditional_headers(entry)
+        result = session.get(url, headers=headers, stream=True)
+        if (result.status_code == 304) and not headers:
+            # a 304 to a request that was not conditional, from a proxy: there is nothing to keep, ask again past it
+            result.close()
+            result = session.get(url, headers={"Cache-Control": "no-cache", "Pragma": "no-cache"}, stream=True)
+            if result.status_code == 304:
+                result.close()
+                raise Exception("304 Not Modified, but there is no cached copy of %s" % url)
+        return result
+        
+    def __conditional_headers(self, entry):
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+        
+    def __blob_path(self, digest):
+        return "%s/blobs/%s/%s" % (CACHE_DIR, digest[:2], digest)
+        
+    def __write_blob(self, result, expected=None):
+        """ Stream the body of result into the cache, hashing the chunks as they come; returns the sha256"""
+        blob_dir = "%s/blobs" % CACHE_DIR
+        if not os.path.isdir(blob_dir):
+            os.makedirs(blob_dir, exist_ok=True)
+        sha256 = hashlib.sha256()
+        
+        def blob_path():
+            digest = sha256.hexdigest()
+            if expected and (expected != digest):
+                raise Exception("sha256 mismatch, %s instead of %s" % (digest, expected))
+            if not os.path.isdir(os.path.dirname(self.__blob_path(digest))):
+                os.makedirs(os.path.dirname(self.__blob_path(digest)), exist_ok=True)
+            return self.__blob_path(digest)
+        
+        with self.__atomic(blob_path, "wb", blob_dir) as blob:
+            for chunk in result.iter_content(CHUNK_SIZE):
+                sha256.update(chunk)
+                blob.write(chunk)
+        return sha256.hexdigest()
+        
+    def __install_blob(self, digest, script_path):
+        with self.__atomic(script_path, "wb") as script, open(self.__blob_path(digest), "rb") as blob:
+            shutil.copyfileobj(blob, script, CHUNK_SIZE)
+        
+    def __temporary(self, directory):
+        # mkstemp makes the file readable by its owner only; a script or bundle gets the permissions of a new file
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_path, 0o666 & ~umask)
+        return fd, tmp_path
+        
+    def __load_cache(self):
+        """ The url -> sha256, ETag and Last-Modified of the shared cache"""
+        try:
+            return json.load(open("%s/urls.json" % CACHE_DIR))
+        except (IOError, ValueError) as e:
+            return {}
+        
+    def __write_cache(self, urls):
+        # read again, such that what other projects cached in the meantime is kept
+        merged = self.__load_cache()
+        merged.update(urls)
+        if not os.path.isdir(CACHE_DIR):
+            os.makedirs(CACHE_DIR)
+        self.__write_json("%s/urls.json" % CACHE_DIR, merged)
+        
+    def build(self, output=None):
+        """ Concatenate the installed packages into one file, every package after the packages it depends on"""
+        self.__load_config()
+        
+        if output:
+            self.config["bundle"] = output
+            self.__write_config()
+        output = self.config.get("bundle") or ("%s/%s" % (self.config.get('dir'), BUNDLE))
+        
+        packages, inputs = self.__bundle_inputs()
+        parts = [[packages[lib].get("name"), packages[lib].get("version"), script, digest] for lib, script, digest in inputs]
+        if self.__write_bundle(output, parts):
+            print("Built %s from %s" % (output, ", ".join(name for name, version, script, digest in parts)))
+        
+    def compress(self, output=None, concurrency=None):
+        """ Minify the installed packages in a process pool, cached by sha256, and concatenate them like build"""
+        self.__load_config()
+        
+        if output:
+            self.config["compressed"] = output
+            self.__write_config()
+        output = self.config.get("compressed") or re.sub(r"(\.js)?$", ".min.js", self.config.get("bundle") or ("%s/%s" % (self.config.get('dir'), BUNDLE)), 1)
+        if not concurrency:
+            concurrency = self.config.get("concurrency", CONCURRENCY)
+        
+        minified_dir = "%s/minified" % CACHE_DIR
+        if not os.path.isdir(minified_dir):
+            os.makedirs(minified_dir)
+        
+        packages, inputs = self.__bundle_inputs()
+        parts = []
+        sources = []
+        targets = []
+        for lib, script, digest in inputs:
+            target = "%s/%s-%d.js" % (minified_dir, digest, jsmin.VERSION)
+            if (not os.path.isfile(target)) and (target not in targets):
+                sources.append(script)
+                targets.append(target)
+            parts.append([packages[lib].get("name"), packages[lib].get("version"), target, "%s-%d" % (digest, jsmin.VERSION)])
+        
+        if targets:
+            with ProcessPoolExecutor(max_workers=min(concurrency, len(targets))) as executor:
+                list(executor.map(jsmin.minify_file, sources, targets))
+        
+        if self.__write_bundle(output, parts):
+            # the scripts before and after, without the headers of the bundle
+            size = sum(os.path.getsize(script) for name, script, digest in inputs)
+            minified = sum(os.path.getsize(target) for name, version, target, digest in parts)
+            print("Compressed %s from %s, minified %d of %d scripts, %d -> %d bytes" % (output, ", ".join(name for name, version, target, digest in parts),
+                len(targets), len(inputs), size, minified))
+        
+    def __bundle_inputs(self):
+        """ The installed packages by lib, and [lib, script, sha256] of each in dependency order"""
+        packages = self.__installed_packages()
+        install_path = "%s/%s" % (ROOT_DIR, self.config.get('dir'))
+        inputs = []
+        for lib in self.__dependency_order(packages):
+            script = packages[lib].get("url").split("/")
+            script = "%s/%s" % (install_path, script[len(script) - 1])
+            inputs.append([lib, script, self.__hash_file(script)])
+        return packages, inputs
+        
+    def __write_bundle(self, output, parts):
+        """ Concatenate the [name, version, script, digest] parts into output unless they did not change; returns whether it was written"""
+        output_path = self.__output_path(output)
+        build_path = "%s/%s" % (PILE_CONF_DIR, BUILD_FILE)
+        
+        try:
+            builds = json.load(open(build_path))
+        except (IOError, ValueError) as e:
+            builds = {}
+        inputs = [[name, digest] for name, version, script, digest in parts]
+        previous = builds.get(output, {})
+        if (previous.get("inputs") == inputs) and os.path.isfile(output_path) and (previous.get("sha256") == self.__hash_file(output_path)):
+            print("%s is up to date" % output)
+            return False
+        
+        if not os.path.isdir(os.path.dirname(output_path)):
+            os.makedirs(os.path.dirname(output_path))
+        
+        with self.__atomic(output_path, "wb") as bundle:
+            for name, version, script, digest in parts:
+                bundle.write(("/* %s %s */\n" % (name, version)).encode("utf8"))
+                with open(script, "rb") as source:
+                    shutil.copyfileobj(source, bundle, CHUNK_SIZE)
+                # a script without a final newline or semicolon must not run into the next one
+                bundle.write(b"\n;\n")
+        
+        builds[output] = {"inputs": inputs, "sha256": self.__hash_file(output_path)}
+        self.__write_json(build_path, builds)
+        return True
+        
+    def __output_path(self, output):
+        # relative to the project, or absolute
+        return os.path.join(ROOT_DIR, output)
+        
+    def __installed_packages(self):
+        """ The cached recipe of every installed package, by lib: the file name of its recipe, as "dependencies" name it"""
+        cache_dir = "%s/%s" % (PILE_CONF_DIR, PKG_DIR)
+        recipes = {}
+        if os.path.isdir(cache_dir):
+            for file in os.listdir(cache_dir):
+                if file.endswith(".json"):
+                    package = json.load(open("%s/%s" % (cache_dir, file)))
+                    recipes[package.get("name")] = [file[:-len(".json")], package]
+        
+        packages = {}
+        for name in self.config.get("installed_packages", []):
+            if name not in recipes:
+                raise Exception("%s is installed, but its recipe is not in %s; install it again" % (name, cache_dir))
+            lib, package = recipes[name]
+            packages[lib] = package
+        return packages
+        
+    def __dependency_order(self, packages):
+        """ The libs of packages, every package after its "dependencies"; otherwise in the order they were installed"""
+        order = []
+        state = {}
+        
+        def visit(lib, path):
+            if state.get(lib) == "done":
+                return
+            if state.get(lib) == "visiting":
+                raise Exception("circular dependency: %s" % " -> ".join(path + [lib]))
+            state[lib] = "visiting"
+            for dependency in packages[lib].get("dependencies", []):
+                if dependency not in packages:
+                    raise Exception("%s depends on %s, which is not installed" % (lib, dependency))
+                visit(dependency, path + [lib])
+            state[lib] = "done"
+            order.append(lib)
+        
+        for lib in packages.keys():
+            visit(lib, [])
+        return order
+        
+    def __hash_file(self, path):
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as source:
+            for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+                sha256.update(chunk)
+        return sha256.hexdigest()
         
     def clear(self):
         pass
@@ -112,28 +681,54 @@ class Pile(object):
 if __name__ == "__main__":
     pile = Pile()
     
-    parser = argparse.ArgumentParser(
-        prog="Pile",
-        description = """
-        \nClient side javascript package manager.
-        \nPile builds a collection of client side javascript files and
-        \ncan either create and manage a js folder or a single, combined, file generated.
-        \n
-        """
-    )
+    # the options take effect while they are parsed (-j, --jobs); the config is written once, after the commands
+    with pile.transaction():
+        parser = argparse.ArgumentParser(
+            prog="Pile",
+            description = """
+            \nClient side javascript package manager.
+            \nPile builds a collection of client side javascript files and
+            \ncan either create and manage a js folder or a single, combined, file generated.
+            \n
+            """
+        )
 
-    parser.add_argument('-n', 'new'     , action="store_true")
-    parser.add_argument('-u', 'update'  , action="store_true")
-    parser.add_argument('-s', 'search'  , type=pile.search, help="Search for a library")
-    parser.add_argument('-i', 'install' , type=pile.install, help="Install a Javascript library")
-    parser.add_argument('-b', 'build'   , type=pile.build)
-    parser.add_argument('-c', 'compress', type=pile.compress)
-    parser.add_argument('-j', 'jsdir'  , type=pile.js_dir, help="Set the Javascript directory to download files to")
+        parser.add_argument('-n', '--new'     , action="store_true")
+        parser.add_argument('-u', '--update'  , nargs="?", const="", metavar="ARCHIVE", help="Update the recipes with git pull, or from a tar of them (a file or an http url)")
+        parser.add_argument('-s', '--search'  , type=pile.search, help="Search for a library")
+        parser.add_argument('-i', '--install' , nargs="+", help="Install one or more Javascript libraries")
+        parser.add_argument('--frozen'        , action="store_true", help="Install the libraries of %s (or only those given with -i) as they were locked, from the cache when their sha256 matches" % LOCK_FILE)
+        parser.add_argument('--jobs'          , type=pile.set_concurrency, help="Set how many libraries are downloaded at once (default %d)" % CONCURRENCY)
+        parser.add_argument('-b', '--build'   , nargs="?", const="", metavar="BUNDLE", help="Combine the installed libraries into one file (default <jsdir>/%s)" % BUNDLE)
+        parser.add_argument('-c', '--compress', nargs="?", const="", metavar="BUNDLE", help="Combine the installed libraries into one minified file (default <bundle>.min.js)")
+        parser.add_argument('-j', '--jsdir'  , type=pile.js_dir, help="Set the Javascript directory to download files to")
 
-    parsed = parser.parse_args()
+        parsed = parser.parse_args()
 
-    if parsed.new:
-        pile.new()
-        
-    if parsed.update:
-        pile.update()
+        if parsed.new:
+            pile.new()
+            
+        if parsed.update != None:
+            try:
+                pile.update(parsed.update or None)
+            except Exception as e:
+                print("Could not update: %s" % e)
+                sys.exit(1)
+            
+        if parsed.install or parsed.frozen:
+            if pile.install(parsed.install or [], frozen=parsed.frozen):
+                sys.exit(1)
+            
+        if parsed.build != None:
+            try:
+                pile.build(parsed.build or None)
+            except Exception as e:
+                print("Could not build: %s" % e)
+                sys.exit(1)
+            
+        if parsed.compress != None:
+            try:
+                pile.compress(parsed.compress or None)
+            except Exception as e:
+                print("Could not compress: %s" % e)
+                sys.exit(1)